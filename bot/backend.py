@@ -0,0 +1,221 @@
+"""
+Cliente del backend de RandomYT compartido por los bots de Discord y Matrix.
+
+- InProcessBackend: llama directamente a IVideoService / ITaskService (vía
+  common.ioc) en el event loop de la API. Es lo que se usa cuando el bot se
+  arranca desde main.py y evita una vuelta completa por HTTP/TLS.
+- HttpBackend: usa la API pública; para cuando el bot corre por separado.
+  Un solo pool de conexiones con keep-alive, timeouts explícitos y
+  reintentos con jitter ante errores de red o 502/503/504.
+
+Ambos devuelven lo mismo que los endpoints equivalentes, lanzan ValueError
+con el mensaje de error del servidor (p. ej. "Video is in database") y
+agrupan las peticiones idénticas en curso (el mismo /publish enviado dos
+veces hace una sola llamada).
+"""
+import asyncio
+import os
+import random
+import re
+from datetime import datetime
+from typing import List, Optional
+
+import aiohttp
+
+from common.config import BOT_HTTP_POOL_SIZE, BOT_HTTP_TIMEOUT, BOT_HTTP_RETRIES
+
+API_BASE_URL = os.environ.get("API_BASE_URL", "https://randomyt-server.vps.lueyo.es")
+
+# Mismo valor por defecto que startDay en GET /random
+DEFAULT_START_DAY = "23/04/2005"
+
+VIDEO_ID_PATTERN = re.compile(
+    r'(?:youtube\.com\/(?:[^\/]+\/.+\/|(?:v|e(?:mbed)?)\/|.*[?&]v=|shorts\/|live\/)|youtu\.be\/)([^"&?\/\s]{11})'
+)
+
+RETRY_STATUS = (502, 503, 504)
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+class _SingleFlight:
+    """Las llamadas con la misma clave mientras hay una en curso esperan a esa."""
+
+    def __init__(self):
+        self._en_curso = {}
+
+    async def _single_flight(self, clave, factory):
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(factory())
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(lambda _: self._en_curso.pop(clave, None))
+        # shield: si un llamante se cancela, la petición sigue para los demás
+        return await asyncio.shield(tarea)
+
+
+class HttpBackend(_SingleFlight):
+
+    def __init__(
+        self,
+        base_url: str = API_BASE_URL,
+        pool_size: int = BOT_HTTP_POOL_SIZE,
+        timeout: float = BOT_HTTP_TIMEOUT,
+        retries: int = BOT_HTTP_RETRIES,
+    ):
+        super().__init__()
+        self._base_url = base_url
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._retries = retries
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _sesion(self) -> aiohttp.ClientSession:
+        # Se crea al primer uso para quedar ligada al loop del bot
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._pool_size, keepalive_timeout=30, ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=self._timeout, connect=min(self._timeout, 5)
+                ),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _request(self, method: str, path: str, params=None, json=None):
+        """Devuelve (status, cuerpo JSON o None) reintentando los fallos transitorios."""
+        for intento in range(self._retries + 1):
+            try:
+                async with self._sesion().request(
+                    method, f"{self._base_url}{path}", params=params, json=json
+                ) as response:
+                    if response.status not in RETRY_STATUS or intento == self._retries:
+                        try:
+                            body = await response.json(content_type=None)
+                        except ValueError:
+                            body = None
+                        return response.status, body
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if intento == self._retries:
+                    raise
+            # Backoff exponencial con jitter completo
+            await asyncio.sleep(random.uniform(0, 0.25 * 2 ** intento))
+
+    @staticmethod
+    def _check(status: int, body):
+        if status >= 400:
+            detail = body.get("detail") if isinstance(body, dict) else None
+            raise ValueError(detail or f"HTTP {status}")
+        return body
+
+    async def get_random_video(
+        self,
+        start_day: Optional[str] = None,
+        end_day: Optional[str] = None,
+        exclude_ids: Optional[List[str]] = None,
+    ):
+        params = {}
+        if start_day:
+            params["startDay"] = start_day
+        if end_day:
+            params["endDay"] = end_day
+        if exclude_ids:
+            # PUT /random es la variante que excluye los IDs del cuerpo
+            status, body = await self._request("PUT", "/random", params, {"ids": exclude_ids})
+        else:
+            status, body = await self._request("GET", "/random", params)
+        if status == 404:
+            return None
+        return self._check(status, body)
+
+    async def publish_video(self, video_id: str):
+        async def publish():
+            return self._check(*await self._request("POST", "/publish", json={"video_id": video_id}))
+
+        return await self._single_flight(("publish", video_id), publish)
+
+    async def add_search_task(self, search: str):
+        async def add_task():
+            return self._check(*await self._request("POST", "/task-search", json={"search_term": search}))
+
+        return await self._single_flight(("task", " ".join(search.split()).lower()), add_task)
+
+
+class InProcessBackend(_SingleFlight):
+    """
+    Llama a los servicios en `loop` (el de la API). Si el bot corre en otro
+    hilo con su propio loop, la llamada se programa en el de la API con
+    run_coroutine_threadsafe para no compartir el cliente de Mongo entre loops.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self._loop = loop
+
+    async def _run(self, coro):
+        if asyncio.get_running_loop() is self._loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def close(self):
+        pass
+
+    async def get_random_video(
+        self,
+        start_day: Optional[str] = None,
+        end_day: Optional[str] = None,
+        exclude_ids: Optional[List[str]] = None,
+    ):
+        async def random_video():
+            from common.ioc import get_video_service
+
+            videoService = get_video_service()
+            video = await videoService.get_random_video_by_interval_exclude_ids(
+                start_day or DEFAULT_START_DAY,
+                end_day or datetime.now().strftime("%d/%m/%Y"),
+                exclude_ids or [],
+            )
+            return video.dict() if video else None
+
+        return await self._run(random_video())
+
+    async def publish_video(self, video_id: str):
+        async def publish():
+            from common.ioc import get_video_service
+            from models.controller.input.publish_video_request import PublishVideoRequest
+
+            request = PublishVideoRequest(video_id=video_id)
+            return {"id": await get_video_service().publish_video(request)}
+
+        return await self._single_flight(("publish", video_id), lambda: self._run(publish()))
+
+    async def add_search_task(self, search: str):
+        async def add_task():
+            from common.ioc import get_task_service
+
+            trimmed_term = search.strip()
+            if not trimmed_term:
+                raise ValueError("search_term cannot be empty")
+            task_id, created = await get_task_service().add_task(trimmed_term)
+            if not created:
+                raise ValueError("A task with this name already exists")
+            return {"search_term": trimmed_term, "id": task_id}
+
+        return await self._single_flight(
+            ("task", " ".join(search.split()).lower()), lambda: self._run(add_task())
+        )
+
+
+def create_backend(api_loop: Optional[asyncio.AbstractEventLoop] = None):
+    """En proceso si se conoce el loop de la API; si no, por HTTP."""
+    if api_loop is not None:
+        return InProcessBackend(api_loop)
+    return HttpBackend()
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from common.utils.rate_limiter import KeyedTokenBuckets
+
+
+class CommandDispatcher:
+    """
+    Saca los comandos del callback de sync: se encolan en una cola acotada y
+    los procesa un pool de workers, así una llamada lenta al backend no frena
+    el resto de eventos.
+
+    - Límite por sala y por usuario (token buckets); lo que lo supera se ignora.
+    - Un comando idéntico (misma sala, comando y argumentos) que llega
+      mientras el anterior sigue pendiente se descarta: lo responde el primero.
+    - Con la cola llena se descarta el comando y se responde `busy_reply`.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable[None]],
+        reply: Callable[[str, str], Awaitable[None]],
+        workers: int,
+        queue_size: int,
+        room_rate: float,
+        user_rate: float,
+        burst: float,
+        busy_reply: str = "The bot is busy right now, please try again in a moment.",
+    ):
+        self._handler = handler
+        self._reply = reply
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._room_limits = KeyedTokenBuckets(room_rate, burst)
+        self._user_limits = KeyedTokenBuckets(user_rate, burst)
+        self._pendientes = set()
+        self._tareas: List[asyncio.Task] = []
+        self._respuestas = set()
+        self.busy_reply = busy_reply
+        self.stats = {"dispatched": 0, "rate_limited": 0, "coalesced": 0, "dropped": 0, "errors": 0}
+
+    def start(self):
+        self._tareas = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+    def submit(self, room, sender: Optional[str], command: str, args: list) -> bool:
+        """Encola el comando sin esperar; devuelve False si se descartó."""
+        clave = (room.room_id, command.lower(), tuple(args))
+        if clave in self._pendientes:
+            self.stats["coalesced"] += 1
+            return False
+
+        if not self._room_limits.try_take(room.room_id) or (
+            sender and not self._user_limits.try_take(sender)
+        ):
+            self.stats["rate_limited"] += 1
+            return False
+
+        try:
+            self._queue.put_nowait((clave, room, command, args))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            tarea = asyncio.create_task(self._reply(room.room_id, self.busy_reply))
+            self._respuestas.add(tarea)
+            tarea.add_done_callback(self._respuestas.discard)
+            return False
+
+        self._pendientes.add(clave)
+        return True
+
+    async def _worker(self):
+        while True:
+            clave, room, command, args = await self._queue.get()
+            try:
+                await self._handler(room, command, args)
+                self.stats["dispatched"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Error processing Matrix command {command!r} in {room.room_id}: {e}")
+            finally:
+                self._pendientes.discard(clave)
+                self._queue.task_done()
+
+    def estado(self) -> dict:
+        return {**self.stats, "queued": self._queue.qsize(), "workers": self.workers}
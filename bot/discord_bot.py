@@ -1,68 +1,67 @@
-import re
 from typing import Optional
 import discord
 from discord import app_commands
 from discord.ext import commands
 import threading
 import asyncio
-import aiohttp
-import os
+import time
 
-API_BASE_URL = os.environ.get("API_BASE_URL", "https://randomyt-server.vps.lueyo.es")
+from bot.backend import create_backend, extract_video_id
+from bot.random_buffer import RandomVideoBuffer
+from common.config import DISCORD_SHARD_COUNT, DISCORD_THREADED
+from common.config import RANDOM_PREFETCH_SIZE, RANDOM_HISTORY_SIZE
+from common.metrics import BOT_COMMAND_DURATION
 
 
-def extract_video_id(url: str) -> Optional[str]:
-    regex = r'(?:youtube\.com\/(?:[^\/]+\/.+\/|(?:v|e(?:mbed)?)\/|.*[?&]v=|shorts\/|live\/)|youtu\.be\/)([^"&?\/\s]{11})'
-    match = re.search(regex, url)
-    return match.group(1) if match else None
-
-
-async def api_get_random_video(session: aiohttp.ClientSession, start_day: Optional[str] = None, end_day: Optional[str] = None):
-    params = {}
-    if start_day:
-        params["startDay"] = start_day
-    if end_day:
-        params["endDay"] = end_day
-    async with session.get(f"{API_BASE_URL}/random", params=params) as response:
-        if response.status == 404:
-            return None
-        response.raise_for_status()
-        return await response.json()
-
-
-async def api_publish_video(session: aiohttp.ClientSession, url: str):
-    video_id = extract_video_id(url)
-    if not video_id:
-        raise ValueError("Could not extract video ID from URL.")
-    
-    async with session.post(f"{API_BASE_URL}/publish", json={"video_id": video_id}) as response:
-        response.raise_for_status()
-        return await response.json()
-
-
-async def api_add_search_task(session: aiohttp.ClientSession, search: str):
-    async with session.post(f"{API_BASE_URL}/task-search", json={"search_term": search}) as response:
-        response.raise_for_status()
-        return await response.json()
-
-
-class LueyoBot(commands.Bot):
-    def __init__(self):
+class LueyoBot(commands.AutoShardedBot):
+    def __init__(self, api_loop: Optional[asyncio.AbstractEventLoop] = None):
         intents = discord.Intents.default()
         intents.message_content = True
-        super().__init__(command_prefix="ryt ", intents=intents, help_command=None)
-        self.http_session: Optional[aiohttp.ClientSession] = None
+        # Sin DISCORD_SHARD_COUNT, Discord indica cuántos shards usar según los servidores
+        super().__init__(
+            command_prefix="ryt ",
+            intents=intents,
+            help_command=None,
+            shard_count=DISCORD_SHARD_COUNT,
+        )
+        # Con el loop de la API se llama a los servicios en proceso; sin él, por HTTP
+        self.api_loop = api_loop
+        self.backend = None
+        self.random_buffer: Optional[RandomVideoBuffer] = None
+        self.tree.interaction_check = self._start_interaction_timer
+
+    async def invoke(self, ctx: commands.Context):
+        # Latencia de los comandos de prefijo, incluidos los que fallan
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        with BOT_COMMAND_DURATION.time(bot="discord", command=ctx.command.name):
+            await super().invoke(ctx)
+
+    @staticmethod
+    async def _start_interaction_timer(interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.perf_counter()
+        return True
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        inicio = interaction.extras.get("started_at")
+        if inicio is not None:
+            BOT_COMMAND_DURATION.observe(
+                time.perf_counter() - inicio, bot="discord", command=f"/{command.name}"
+            )
 
     async def setup_hook(self):
-        self.http_session = aiohttp.ClientSession()
+        self.backend = create_backend(self.api_loop)
+        self.random_buffer = RandomVideoBuffer(
+            self.backend, RANDOM_PREFETCH_SIZE, RANDOM_HISTORY_SIZE
+        )
         await self.tree.sync(guild=None)
         print(f"Bot conectado como {self.user}")
         print("Sincronización completada: Comandos de barra (/) listos.")
         await self._setup_commands()
 
     async def close(self):
-        if self.http_session:
-            await self.http_session.close()
+        if self.backend:
+            await self.backend.close()
         await super().close()
 
     async def _setup_commands(self):
@@ -75,7 +74,9 @@ class LueyoBot(commands.Bot):
             end_day: Optional[str] = None,
         ):
             try:
-                video = await api_get_random_video(self.http_session, start_day, end_day)
+                video = await self.random_buffer.get(
+                    str(interaction.channel_id), start_day, end_day
+                )
                 if video:
                     await interaction.response.send_message(f"https://youtu.be/{video['id']}")
                 else:
@@ -110,7 +111,7 @@ class LueyoBot(commands.Bot):
                 return
 
             try:
-                await api_publish_video(self.http_session, url)
+                await self.backend.publish_video(video_id)
                 await interaction.followup.send(
                     f"Video published successfully!\nhttps://randomyt.lueyo.es/?id={video_id}",
                     ephemeral=True,
@@ -148,7 +149,7 @@ class LueyoBot(commands.Bot):
             await interaction.response.defer(ephemeral=True)
 
             try:
-                result = await api_add_search_task(self.http_session, search)
+                result = await self.backend.add_search_task(search)
                 await interaction.followup.send(
                     f"Task inserted successfully! Task Name: {result['search_term']}",
                     ephemeral=True,
@@ -157,81 +158,80 @@ class LueyoBot(commands.Bot):
                 await interaction.followup.send("Error: An error occurred while processing your request.", ephemeral=True)
 
 
-def run_bot(token: str):
-    import asyncio
-    
-    async def run_async():
-        bot = LueyoBot()
-        
-        @bot.command(name="random")
-        async def prefix_random(ctx, start_day: Optional[str] = None, end_day: Optional[str] = None):
-            try:
-                video = await api_get_random_video(bot.http_session, start_day, end_day)
-                if video:
-                    await ctx.send(f"https://youtu.be/{video['id']}")
-                else:
-                    await ctx.send("No videos found.")
-            except Exception as e:
-                await ctx.send("Error: An error occurred while processing your request.")
-
-        @bot.command(name="randomyt")
-        async def prefix_randomyt(ctx, start_day: Optional[str] = None, end_day: Optional[str] = None):
-            await prefix_random(ctx, start_day, end_day)
-
-        @bot.command(name="publish")
-        async def prefix_publish(ctx, url: str):
-            video_id = extract_video_id(url)
-            if not video_id:
-                await ctx.send("Could not extract video ID from URL.")
-                return
-
-            try:
-                await api_publish_video(bot.http_session, url)
-                await ctx.send(f"Video published successfully!\nhttps://randomyt.lueyo.es/?id={video_id}")
-            except ValueError as e:
-                if "Video is in database" in str(e):
-                    await ctx.send(f"Video is already in database!\nhttps://randomyt.lueyo.es/?id={video_id}")
-                else:
-                    await ctx.send("Error: An error occurred while processing your request.")
-            except Exception as e:
-                await ctx.send("Error: An error occurred while processing your request.")
+def create_bot(api_loop: Optional[asyncio.AbstractEventLoop] = None) -> "LueyoBot":
+    bot = LueyoBot(api_loop)
+
+    @bot.command(name="random")
+    async def prefix_random(ctx, start_day: Optional[str] = None, end_day: Optional[str] = None):
+        try:
+            video = await bot.random_buffer.get(str(ctx.channel.id), start_day, end_day)
+            if video:
+                await ctx.send(f"https://youtu.be/{video['id']}")
+            else:
+                await ctx.send("No videos found.")
+        except Exception as e:
+            await ctx.send("Error: An error occurred while processing your request.")
+
+    @bot.command(name="randomyt")
+    async def prefix_randomyt(ctx, start_day: Optional[str] = None, end_day: Optional[str] = None):
+        await prefix_random(ctx, start_day, end_day)
+
+    @bot.command(name="publish")
+    async def prefix_publish(ctx, url: str):
+        video_id = extract_video_id(url)
+        if not video_id:
+            await ctx.send("Could not extract video ID from URL.")
+            return
 
-        @bot.command(name="massinsert")
-        async def prefix_massinsert(ctx, *, search: str):
-            try:
-                result = await api_add_search_task(bot.http_session, search)
-                await ctx.send(f"Task inserted successfully! Task ID: {result['search_term']}")
-            except Exception as e:
+        try:
+            await bot.backend.publish_video(video_id)
+            await ctx.send(f"Video published successfully!\nhttps://randomyt.lueyo.es/?id={video_id}")
+        except ValueError as e:
+            if "Video is in database" in str(e):
+                await ctx.send(f"Video is already in database!\nhttps://randomyt.lueyo.es/?id={video_id}")
+            else:
                 await ctx.send("Error: An error occurred while processing your request.")
+        except Exception as e:
+            await ctx.send("Error: An error occurred while processing your request.")
+
+    @bot.command(name="massinsert")
+    async def prefix_massinsert(ctx, *, search: str):
+        try:
+            result = await bot.backend.add_search_task(search)
+            await ctx.send(f"Task inserted successfully! Task ID: {result['search_term']}")
+        except Exception as e:
+            await ctx.send("Error: An error occurred while processing your request.")
+
+    @bot.command(name="invite")
+    async def prefix_invite(ctx):
+        await ctx.send("https://discord.com/oauth2/authorize?client_id=1474853531457683629&permissions=0&integration_type=0&scope=bot")
+
+    @bot.command(name="support")
+    async def prefix_support(ctx):
+        await ctx.send("https://ko-fi.com/lueyo")
+
+    @bot.command(name="help")
+    async def prefix_help(ctx):
+        embed = discord.Embed(
+            title="📚 Randomyt Bot - Comandos",
+            description="Usa los siguientes comandos con el prefijo `ryt `",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="🎲 random", value="Obtiene un video aleatorio de YouTube", inline=False)
+        embed.add_field(name="📅 random <fecha>", value="Obtiene un video aleatorio de una fecha específica (dd/MM/YYYY)", inline=False)
+        embed.add_field(name="📅 random <inicio> <fin>", value="Obtiene un video aleatorio en un intervalo de fechas", inline=False)
+        embed.add_field(name="📤 publish <url>", value="Publica un video de YouTube en la base de datos", inline=False)
+        embed.add_field(name="🔍 massinsert <busqueda>", value="Inserta una tarea de búsqueda", inline=False)
+        embed.add_field(name="🔗 invite", value="Obtiene el enlace de invitación del bot", inline=False)
+        embed.add_field(name="💝 support", value="Apoya el proyecto en Ko-fi", inline=False)
+        embed.add_field(name="❓ help", value="Muestra este mensaje de ayuda", inline=False)
+        await ctx.send(embed=embed)
 
-        @bot.command(name="invite")
-        async def prefix_invite(ctx):
-            await ctx.send("https://discord.com/oauth2/authorize?client_id=1474853531457683629&permissions=0&integration_type=0&scope=bot")
-
-        @bot.command(name="support")
-        async def prefix_support(ctx):
-            await ctx.send("https://ko-fi.com/lueyo")
+    return bot
 
-        @bot.command(name="help")
-        async def prefix_help(ctx):
-            embed = discord.Embed(
-                title="📚 Randomyt Bot - Comandos",
-                description="Usa los siguientes comandos con el prefijo `ryt `",
-                color=discord.Color.blue()
-            )
-            embed.add_field(name="🎲 random", value="Obtiene un video aleatorio de YouTube", inline=False)
-            embed.add_field(name="📅 random <fecha>", value="Obtiene un video aleatorio de una fecha específica (dd/MM/YYYY)", inline=False)
-            embed.add_field(name="📅 random <inicio> <fin>", value="Obtiene un video aleatorio en un intervalo de fechas", inline=False)
-            embed.add_field(name="📤 publish <url>", value="Publica un video de YouTube en la base de datos", inline=False)
-            embed.add_field(name="🔍 massinsert <busqueda>", value="Inserta una tarea de búsqueda", inline=False)
-            embed.add_field(name="🔗 invite", value="Obtiene el enlace de invitación del bot", inline=False)
-            embed.add_field(name="💝 support", value="Apoya el proyecto en Ko-fi", inline=False)
-            embed.add_field(name="❓ help", value="Muestra este mensaje de ayuda", inline=False)
-            await ctx.send(embed=embed)
 
-        await bot.start(token)
-
-    asyncio.run(run_async())
+def run_bot(token: str, api_loop: Optional[asyncio.AbstractEventLoop] = None):
+    asyncio.run(create_bot(api_loop).start(token))
 
 
 class DiscordBot:
@@ -242,6 +242,26 @@ class DiscordBot:
         if not token:
             print("Discord bot token not configured. Bot will not start.")
             return
-        print("Starting Discord bot in background thread...")
-        thread = threading.Thread(target=run_bot, args=(token,), daemon=True)
-        thread.start()
+        api_loop = asyncio.get_running_loop()
+        if DISCORD_THREADED:
+            print("Starting Discord bot in background thread...")
+            # El bot usa su propio loop; los comandos se ejecutan en el de la API
+            thread = threading.Thread(target=run_bot, args=(token, api_loop), daemon=True)
+            thread.start()
+            return
+
+        print("Starting Discord bot on the API event loop...")
+        self.bot = create_bot(api_loop)
+        await self.bot.start(token)
+
+    async def stop(self):
+        # En modo hilo el bot muere con el proceso (hilo daemon)
+        if self.bot and not self.bot.is_closed():
+            await self.bot.close()
+
+
+if __name__ == "__main__":
+    # Standalone: sin API en el mismo proceso, los comandos van por HTTP a API_BASE_URL
+    from common.config import DISCORD_YT_RAMDOM
+
+    run_bot(DISCORD_YT_RAMDOM)
@@ -1,50 +1,38 @@
-import re
 import asyncio
-import aiohttp
-from typing import Optional
-from nio import AsyncClient, MatrixRoom, RoomMessageText
-
-API_BASE_URL = "https://randomyt-server.vps.lueyo.es"
+import time
+from nio import AsyncClient, MatrixRoom, RoomMessageText, SyncResponse
+
+from bot.backend import create_backend, extract_video_id
+from bot.command_dispatcher import CommandDispatcher
+from bot.matrix_store import MatrixSyncStore
+from bot.random_buffer import RandomVideoBuffer
+from common.config import RANDOM_PREFETCH_SIZE, RANDOM_HISTORY_SIZE
+from common.config import MATRIX_STORE_PATH, MATRIX_MAX_EVENT_AGE
+from common.metrics import BOT_COMMAND_DURATION
+from common.config import MATRIX_WORKERS, MATRIX_QUEUE_SIZE, MATRIX_ROOM_RATE, MATRIX_USER_RATE, MATRIX_RATE_BURST
 
 COMMAND_PREFIX = "ryt "
 
-global_client = None
-sync_token = None
-
-
-def extract_video_id(url: str) -> Optional[str]:
-    regex = r'(?:youtube\.com\/(?:[^\/]+\/.+\/|(?:v|e(?:mbed)?)\/|.*[?&]v=|shorts\/|live\/)|youtu\.be\/)([^"&?\/\s]{11})'
-    match = re.search(regex, url)
-    return match.group(1) if match else None
-
-
-async def api_get_random_video(session: aiohttp.ClientSession, start_day: Optional[str] = None, end_day: Optional[str] = None):
-    params = {}
-    if start_day:
-        params["startDay"] = start_day
-    if end_day:
-        params["endDay"] = end_day
-    async with session.get(f"{API_BASE_URL}/random", params=params) as response:
-        if response.status == 404:
-            return None
-        response.raise_for_status()
-        return await response.json()
-
+# Solo mensajes de las salas en las que está el bot, sin presencia, recibos ni
+# datos de cuenta; los miembros se cargan de forma diferida (lazy loading)
+SYNC_FILTER = {
+    "presence": {"types": []},
+    "account_data": {"types": []},
+    "room": {
+        "timeline": {"types": ["m.room.message"], "limit": 20},
+        "state": {"lazy_load_members": True},
+        "ephemeral": {"types": []},
+        "account_data": {"types": []},
+    },
+}
+
+# Sin token guardado no interesa el historial: se empieza desde ahora
+FIRST_SYNC_FILTER = {
+    **SYNC_FILTER,
+    "room": {**SYNC_FILTER["room"], "timeline": {"types": ["m.room.message"], "limit": 0}},
+}
 
-async def api_publish_video(session: aiohttp.ClientSession, url: str):
-    video_id = extract_video_id(url)
-    if not video_id:
-        raise ValueError("Could not extract video ID from URL.")
-    
-    async with session.post(f"{API_BASE_URL}/publish", json={"video_id": video_id}) as response:
-        response.raise_for_status()
-        return await response.json()
-
-
-async def api_add_search_task(session: aiohttp.ClientSession, search: str):
-    async with session.post(f"{API_BASE_URL}/task-search", json={"search_term": search}) as response:
-        response.raise_for_status()
-        return await response.json()
+global_client = None
 
 
 async def send_message(client: AsyncClient, room_id: str, message: str):
@@ -58,7 +46,10 @@ async def send_message(client: AsyncClient, room_id: str, message: str):
     )
 
 
-async def process_command(client: AsyncClient, room: MatrixRoom, command: str, args: list, http_session: aiohttp.ClientSession):
+MATRIX_COMMANDS = ("random", "randomyt", "publish", "massinsert", "invite", "support", "help")
+
+
+async def process_command(client: AsyncClient, room: MatrixRoom, command: str, args: list):
     command = command.lower()
     
     if command in ("random", "randomyt"):
@@ -66,7 +57,7 @@ async def process_command(client: AsyncClient, room: MatrixRoom, command: str, a
         end_day = args[1] if len(args) > 1 else None
         
         try:
-            video = await api_get_random_video(http_session, start_day, end_day)
+            video = await client.random_buffer.get(room.room_id, start_day, end_day)
             if video:
                 await send_message(client, room.room_id, f"https://youtu.be/{video['id']}")
             else:
@@ -87,7 +78,7 @@ async def process_command(client: AsyncClient, room: MatrixRoom, command: str, a
             return
         
         try:
-            await api_publish_video(http_session, url)
+            await client.backend.publish_video(video_id)
             await send_message(client, room.room_id, f"Video published successfully!\nhttps://randomyt.lueyo.es/?id={video_id}")
         except Exception as e:
             if "Video is in database" in str(e):
@@ -103,7 +94,7 @@ async def process_command(client: AsyncClient, room: MatrixRoom, command: str, a
         search = " ".join(args)
         
         try:
-            result = await api_add_search_task(http_session, search)
+            result = await client.backend.add_search_task(search)
             await send_message(client, room.room_id, f"Task inserted successfully! Task Name: {result['search_term']}")
         except Exception as e:
             await send_message(client, room.room_id, "Error: An error occurred while processing your request.")
@@ -134,7 +125,9 @@ Usa los siguientes comandos con el prefijo `ryt `
 
 
 async def message_callback(room: MatrixRoom, event: RoomMessageText):
-    if sync_token is None:
+    # Al reanudar desde el token guardado llegan también los mensajes enviados
+    # mientras el bot estaba parado; los antiguos ya no se responden
+    if time.time() * 1000 - event.server_timestamp > MATRIX_MAX_EVENT_AGE * 1000:
         return
     
     if not event.body.startswith(COMMAND_PREFIX):
@@ -149,7 +142,8 @@ async def message_callback(room: MatrixRoom, event: RoomMessageText):
     command = parts[0]
     args = parts[1:]
     
-    await process_command(global_client, room, command, args, global_client.http_session)
+    # Sin await: el comando se procesa en el pool del dispatcher y el sync sigue
+    global_client.dispatcher.submit(room, event.sender, command, args)
 
 
 _global_client = None
@@ -159,27 +153,72 @@ def set_global_client(client):
     _global_client = client
 
 
-async def matrix_bot_main(homeserver: str, user_id: str, access_token: str):
-    global global_client, sync_token
+async def matrix_bot_main(homeserver: str, user_id: str, access_token: str, in_process: bool = True):
+    global global_client
     
     client = AsyncClient(homeserver, user_id)
-    client.http_session = aiohttp.ClientSession()
+    # Arrancado desde la API los servicios se llaman en este mismo loop
+    client.backend = create_backend(asyncio.get_running_loop() if in_process else None)
+    client.random_buffer = RandomVideoBuffer(
+        client.backend, RANDOM_PREFETCH_SIZE, RANDOM_HISTORY_SIZE
+    )
     
     client.access_token = access_token
     
     set_global_client(client)
     global_client = client
     
+    async def handle(room: MatrixRoom, command: str, args: list):
+        # Los comandos desconocidos se agrupan para no crear una serie por texto libre
+        etiqueta = command.lower() if command.lower() in MATRIX_COMMANDS else "other"
+        with BOT_COMMAND_DURATION.time(bot="matrix", command=etiqueta):
+            await process_command(client, room, command, args)
+
+    async def reply(room_id: str, message: str):
+        await send_message(client, room_id, message)
+
+    client.dispatcher = CommandDispatcher(
+        handle,
+        reply,
+        MATRIX_WORKERS,
+        MATRIX_QUEUE_SIZE,
+        MATRIX_ROOM_RATE,
+        MATRIX_USER_RATE,
+        MATRIX_RATE_BURST,
+    )
+    client.dispatcher.start()
+
     client.add_event_callback(message_callback, RoomMessageText)
-    
-    print(f"Connecting to Matrix as {user_id}...")
-    await client.sync()
-    sync_token = "initialized"
-    
+
+    store = MatrixSyncStore(MATRIX_STORE_PATH)
+    store.load()
+
+    async def save_sync_state(response: SyncResponse):
+        store.save(response.next_batch)
+
+    client.add_response_callback(save_sync_state, SyncResponse)
+
+    if store.next_batch:
+        print(f"Resuming Matrix sync as {user_id}...")
+        client.next_batch = store.next_batch
+    else:
+        print(f"Connecting to Matrix as {user_id}...")
+
     print("Matrix bot ready!")
-    
-    while True:
-        await client.sync_forever(timeout=30000)
+
+    try:
+        while True:
+            await client.sync_forever(
+                timeout=30000,
+                sync_filter=SYNC_FILTER,
+                since=store.next_batch,
+                # Al reanudar, el primer sync es incremental: se pide explícitamente
+                # el filtro ligero en vez de depender de lo que haga nio con None
+                first_sync_filter=SYNC_FILTER if store.next_batch else FIRST_SYNC_FILTER,
+            )
+    finally:
+        await client.dispatcher.stop()
+        await client.backend.close()
 
 
 class MatrixBot:
@@ -0,0 +1,35 @@
+import json
+import os
+from typing import Optional
+
+
+class MatrixSyncStore:
+    """
+    Guarda en un JSON local el token next_batch del último sync, para
+    reanudar con un sync incremental tras un reinicio en lugar de volver a
+    descargar el estado de todas las salas. El estado de las salas no hace
+    falta: nio crea cada MatrixRoom al recibir su primer evento.
+
+    Se escribe tras cada sync (de forma atómica): reanudar desde un token
+    anterior volvería a entregar comandos ya respondidos.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.next_batch: Optional[str] = None
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.next_batch = datos.get("next_batch")
+
+    def save(self, next_batch: str):
+        self.next_batch = next_batch
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporal = f"{self.path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"next_batch": next_batch}, f)
+        os.replace(temporal, self.path)
@@ -0,0 +1,89 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Optional
+
+
+class RandomVideoBuffer:
+    """
+    Videos aleatorios ya pedidos al backend, listos para responder al instante.
+
+    Hay un buffer por (canal, filtro de fechas) con hasta `size` videos; cada
+    vez que se usa uno se rellena en segundo plano. Cada canal recuerda sus
+    últimos `history` videos y los excluye al pedir nuevos, para no repetirlos.
+    Solo se mantienen los `max_keys` buffers usados más recientemente.
+    """
+
+    def __init__(self, backend, size: int = 3, history: int = 50, max_keys: int = 1000):
+        self.backend = backend
+        self.size = size
+        self.history = history
+        self.max_keys = max_keys
+        self._buffers: "OrderedDict[tuple, deque]" = OrderedDict()
+        self._historial: "OrderedDict[str, deque]" = OrderedDict()
+        self._rellenando = {}
+
+    def _excluidos(self, channel_id: str):
+        excluidos = set(self._historial.get(channel_id, ()))
+        for (canal, _, _), buffer in self._buffers.items():
+            if canal == channel_id:
+                excluidos.update(video["id"] for video in buffer)
+        return list(excluidos)
+
+    def _recordar(self, channel_id: str, video_id: str):
+        historial = self._historial.get(channel_id)
+        if historial is None:
+            historial = self._historial[channel_id] = deque(maxlen=self.history)
+        self._historial.move_to_end(channel_id)
+        historial.append(video_id)
+        while len(self._historial) > self.max_keys:
+            self._historial.popitem(last=False)
+
+    def _buffer(self, clave: tuple) -> deque:
+        buffer = self._buffers.get(clave)
+        if buffer is None:
+            buffer = self._buffers[clave] = deque()
+        self._buffers.move_to_end(clave)
+        while len(self._buffers) > self.max_keys:
+            self._buffers.popitem(last=False)
+        return buffer
+
+    async def get(self, channel_id: str, start_day: Optional[str] = None, end_day: Optional[str] = None):
+        """Devuelve un video (dict) o None si no hay ninguno que no se haya visto ya."""
+        clave = (channel_id, start_day, end_day)
+        buffer = self._buffer(clave)
+        if buffer:
+            video = buffer.popleft()
+        else:
+            # Primera petición del canal/filtro o buffer agotado: se espera al backend
+            video = await self.backend.get_random_video(
+                start_day, end_day, self._excluidos(channel_id)
+            )
+            if not video and self._historial.get(channel_id):
+                # El canal ya vio todos los videos del filtro: se permite repetir
+                self._historial[channel_id].clear()
+                video = await self.backend.get_random_video(start_day, end_day)
+        if video:
+            self._recordar(channel_id, video["id"])
+        self._programar_relleno(clave)
+        return video
+
+    def _programar_relleno(self, clave: tuple):
+        if clave in self._rellenando:
+            return
+        tarea = asyncio.create_task(self._rellenar(clave))
+        self._rellenando[clave] = tarea
+        tarea.add_done_callback(lambda _: self._rellenando.pop(clave, None))
+
+    async def _rellenar(self, clave: tuple):
+        channel_id, start_day, end_day = clave
+        try:
+            while len(self._buffers.get(clave, ())) < self.size:
+                video = await self.backend.get_random_video(
+                    start_day, end_day, self._excluidos(channel_id)
+                )
+                if not video or clave not in self._buffers:
+                    return
+                self._buffers[clave].append(video)
+        except Exception as e:
+            # El siguiente uso pedirá el video directamente y volverá a intentarlo
+            print(f"Error prefetching random videos for {clave}: {e}")
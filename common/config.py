@@ -15,4 +15,113 @@ MATRIX_YT_RANDOM_TOKEN = os.getenv("MATRIX_YT_RANDOM_TOKEN", "")
 MATRIX_HOMESERVER = os.getenv("MATRIX_HOMESERVER", "https://matrix.org")
 MATRIX_USER_ID = os.getenv("MATRIX_USER_ID", "@lueyobot:matrix.org")
 
-SEARCH_NUMBER = int(os.getenv("SEARCH_NUMBER", 300))
\ No newline at end of file
+SEARCH_NUMBER = int(os.getenv("SEARCH_NUMBER", 300))
+
+# Pool de hilos para las estrategias de búsqueda bloqueantes (yt-dlp, requests...)
+SEARCH_POOL_WORKERS = int(os.getenv("SEARCH_POOL_WORKERS", 2))
+SEARCH_TIMEOUT = int(os.getenv("SEARCH_TIMEOUT", 120))
+
+# Workers concurrentes de la cola de tareas por proceso y duración del lease
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", 2))
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", 300))
+TASK_POLL_INTERVAL = int(os.getenv("TASK_POLL_INTERVAL", 30))
+
+# Aviso de tareas nuevas entre procesos: change streams o sondeo adaptativo
+TASK_CHANGE_STREAMS = os.getenv("TASK_CHANGE_STREAMS", "true").lower() in ("1", "true", "yes")
+TASK_POLL_MIN_INTERVAL = float(os.getenv("TASK_POLL_MIN_INTERVAL", 0.5))
+
+# Si es false la API no procesa tareas y hay que lanzar worker.py aparte
+EMBEDDED_TASK_PROCESSOR = os.getenv("EMBEDDED_TASK_PROCESSOR", "true").lower() in ("1", "true", "yes")
+
+# Presupuesto compartido por todos los workers para cada proveedor de búsqueda,
+# en búsquedas por minuto ("proveedor:tasa,..."), y ráfaga máxima permitida
+SEARCH_RATE_LIMITS = os.getenv("SEARCH_RATE_LIMITS", "ytdlp:30,ytsearch:20,invidious:20")
+SEARCH_RATE_BURST = float(os.getenv("SEARCH_RATE_BURST", 5))
+# Espera máxima por un token desde un hilo del pool de búsqueda: si el
+# proveedor está saturado se libera el hilo y se prueba la siguiente estrategia
+SEARCH_RATE_THREAD_WAIT = float(os.getenv("SEARCH_RATE_THREAD_WAIT", 5))
+
+# Reintentos de tareas fallidas: backoff exponencial desde TASK_RETRY_BASE_SECONDS
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", 5))
+TASK_RETRY_BASE_SECONDS = int(os.getenv("TASK_RETRY_BASE_SECONDS", 60))
+TASK_PROGRESS_INTERVAL = float(os.getenv("TASK_PROGRESS_INTERVAL", 1.0))
+
+# Archivo de resultados de búsqueda: se reutiliza si tiene menos de ARCHIVE_MAX_AGE
+# segundos; si es más antiguo y ARCHIVE_INCREMENTAL, solo se buscan los videos nuevos
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archives")
+ARCHIVE_MAX_AGE = int(os.getenv("ARCHIVE_MAX_AGE", 86400))
+ARCHIVE_INCREMENTAL = os.getenv("ARCHIVE_INCREMENTAL", "true").lower() in ("1", "true", "yes")
+# Candidatos máximos por archivo y IDs por fecha de subida que se guardan como marca para la búsqueda incremental
+ARCHIVE_MAX_CANDIDATES = int(os.getenv("ARCHIVE_MAX_CANDIDATES", 2000))
+ARCHIVE_RECENT_IDS = int(os.getenv("ARCHIVE_RECENT_IDS", 100))
+
+# Instancias de Invidious (separadas por comas) y límites del cliente paralelo
+INVIDIOUS_INSTANCES = [
+    url.strip()
+    for url in os.getenv("INVIDIOUS_INSTANCES", "https://yewtu.be").split(",")
+    if url.strip()
+]
+INVIDIOUS_PAGE_TIMEOUT = float(os.getenv("INVIDIOUS_PAGE_TIMEOUT", 10))
+INVIDIOUS_CONCURRENCY = int(os.getenv("INVIDIOUS_CONCURRENCY", 5))
+INVIDIOUS_MAX_PAGES = int(os.getenv("INVIDIOUS_MAX_PAGES", 10))
+
+# Micro-lotes de consultas de metadatos y publicaciones concurrentes por búsqueda
+METADATA_BATCH_SIZE = int(os.getenv("METADATA_BATCH_SIZE", 50))
+METADATA_BATCH_WAIT_MS = float(os.getenv("METADATA_BATCH_WAIT_MS", 5))
+INGEST_PUBLISH_CONCURRENCY = int(os.getenv("INGEST_PUBLISH_CONCURRENCY", 16))
+
+# Refresco periódico de vistas: lotes, pausa entre lotes y antigüedad mínima de la última revisión
+VIEWS_REFRESH_ENABLED = os.getenv("VIEWS_REFRESH_ENABLED", "false").lower() in ("1", "true", "yes")
+VIEWS_REFRESH_BATCH = int(os.getenv("VIEWS_REFRESH_BATCH", 200))
+VIEWS_REFRESH_PAUSE = float(os.getenv("VIEWS_REFRESH_PAUSE", 5))
+VIEWS_REFRESH_MAX_AGE = int(os.getenv("VIEWS_REFRESH_MAX_AGE", 7 * 86400))
+VIEWS_REFRESH_IDLE = int(os.getenv("VIEWS_REFRESH_IDLE", 600))
+
+# Buffer de inserción de la ingesta: tamaño máximo del lote y espera máxima
+INSERT_BUFFER_SIZE = int(os.getenv("INSERT_BUFFER_SIZE", 100))
+INSERT_BUFFER_WAIT_MS = float(os.getenv("INSERT_BUFFER_WAIT_MS", 200))
+
+# Bot de Discord: en el event loop de la API (por defecto) o en un hilo propio, y nº de shards (vacío = automático)
+DISCORD_THREADED = os.getenv("DISCORD_THREADED", "false").lower() in ("1", "true", "yes")
+DISCORD_SHARD_COUNT = int(os.getenv("DISCORD_SHARD_COUNT")) if os.getenv("DISCORD_SHARD_COUNT") else None
+
+# Bots: videos aleatorios precargados por (canal, fechas) e historial por canal para no repetir
+RANDOM_PREFETCH_SIZE = int(os.getenv("RANDOM_PREFETCH_SIZE", 3))
+RANDOM_HISTORY_SIZE = int(os.getenv("RANDOM_HISTORY_SIZE", 50))
+
+# Bot de Matrix: fichero con el token de sync y las salas, y antigüedad máxima de los comandos atendidos
+MATRIX_STORE_PATH = os.getenv("MATRIX_STORE_PATH", "matrix_store/sync.json")
+MATRIX_MAX_EVENT_AGE = int(os.getenv("MATRIX_MAX_EVENT_AGE", 300))
+
+# Bot de Matrix: workers y tamaño de la cola de comandos, y límites por sala/usuario (comandos por minuto)
+MATRIX_WORKERS = int(os.getenv("MATRIX_WORKERS", 4))
+MATRIX_QUEUE_SIZE = int(os.getenv("MATRIX_QUEUE_SIZE", 100))
+MATRIX_ROOM_RATE = float(os.getenv("MATRIX_ROOM_RATE", 30))
+MATRIX_USER_RATE = float(os.getenv("MATRIX_USER_RATE", 10))
+MATRIX_RATE_BURST = float(os.getenv("MATRIX_RATE_BURST", 5))
+
+# Cliente HTTP de los bots cuando corren fuera de la API: conexiones, timeout (s) y reintentos
+BOT_HTTP_POOL_SIZE = int(os.getenv("BOT_HTTP_POOL_SIZE", 20))
+BOT_HTTP_TIMEOUT = float(os.getenv("BOT_HTTP_TIMEOUT", 10))
+BOT_HTTP_RETRIES = int(os.getenv("BOT_HTTP_RETRIES", 2))
+
+# Token de los endpoints de administración (cabecera X-Admin-Token); vacío = deshabilitados
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Monitor de comandos de Mongo: umbral de consulta lenta (ms) y formas de consulta lentas que se conservan
+MONGO_SLOW_MS = float(os.getenv("MONGO_SLOW_MS", 100))
+MONGO_SLOW_SHAPES = int(os.getenv("MONGO_SLOW_SHAPES", 200))
+MONGO_EXPLAIN_SLOW = os.getenv("MONGO_EXPLAIN_SLOW", "true").lower() in ("1", "true", "yes")
+
+# Perfilado de peticiones con pyinstrument: deshabilitado por defecto, fracción muestreada, intervalo (s), directorio y perfiles guardados
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.001))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_MAX_STORED = int(os.getenv("PROFILING_MAX_STORED", 50))
+
+# Monitor del event loop: intervalo de medición (s), bloqueo a partir del cual se captura la pila (s) y bloqueos guardados
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", 0.1))
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", 0.5))
+LOOP_STALL_HISTORY = int(os.getenv("LOOP_STALL_HISTORY", 20))
@@ -1,29 +1,59 @@
 from repository.VideoRepository import IVideoRepository, VideoRepository
 from repository.TaskRepository import ITaskRepository, TaskRepository
+from repository.TaskNotifier import ITaskNotifier, TaskNotifier
+from repository.VideoInsertBuffer import VideoInsertBuffer
+from db.client import db_client, db_tasks
 from fastapi import Depends
 from service.VideoService import IVideoService, VideoService
 from service.TaskService import ITaskService, TaskService
+from common.utils.search_pool import SearchPool
+from common.utils.rate_limiter import RateLimiter, parse_rate_limits
+from common.utils.invidious_client import InvidiousClient
+from common.utils.metadata_batcher import MetadataBatcher
+from common.utils.views_refresher import ViewsRefresher
+from common.utils.profiling import ProfileStore
+from common.utils.loop_monitor import LoopLagMonitor
+from common.config import SEARCH_POOL_WORKERS, SEARCH_TIMEOUT
+from common.config import TASK_CHANGE_STREAMS, TASK_POLL_MIN_INTERVAL, TASK_POLL_INTERVAL
+from common.config import SEARCH_RATE_LIMITS, SEARCH_RATE_BURST
+from common.config import METADATA_BATCH_SIZE, METADATA_BATCH_WAIT_MS
+from common.config import INSERT_BUFFER_SIZE, INSERT_BUFFER_WAIT_MS
+from common.config import VIEWS_REFRESH_BATCH, VIEWS_REFRESH_PAUSE, VIEWS_REFRESH_MAX_AGE, VIEWS_REFRESH_IDLE
+from common.config import PROFILING_DIR, PROFILING_MAX_STORED
+from common.config import LOOP_MONITOR_INTERVAL, LOOP_STALL_THRESHOLD, LOOP_STALL_HISTORY
+from common.config import INVIDIOUS_INSTANCES, INVIDIOUS_PAGE_TIMEOUT, INVIDIOUS_CONCURRENCY, INVIDIOUS_MAX_PAGES
 
 
 _video_repository_instance = None
 _video_service_instance = None
 _task_repository_instance = None
 _task_service_instance = None
+_search_pool_instance = None
+_task_notifier_instance = None
+_rate_limiter_instance = None
+_invidious_client_instance = None
+_metadata_batcher_instance = None
+_views_refresher_instance = None
+_video_insert_buffer_instance = None
+_profile_store_instance = None
+_loop_monitor_instance = None
 
 
 def get_video_repository() -> IVideoRepository:
     global _video_repository_instance
     if _video_repository_instance is None:
-        _video_repository_instance = VideoRepository()
+        _video_repository_instance = VideoRepository(get_video_insert_buffer())
     return _video_repository_instance
 
 
 def get_video_service() -> IVideoService:
     global _video_repository_instance, _video_service_instance
     if _video_repository_instance is None:
-        _video_repository_instance = VideoRepository()
+        _video_repository_instance = VideoRepository(get_video_insert_buffer())
     if _video_service_instance is None:
-        _video_service_instance = VideoService(_video_repository_instance)
+        _video_service_instance = VideoService(
+            _video_repository_instance, get_metadata_batcher()
+        )
     return _video_service_instance
 
 
@@ -34,10 +64,101 @@ def get_task_repository() -> ITaskRepository:
     return _task_repository_instance
 
 
+def get_task_notifier() -> ITaskNotifier:
+    global _task_notifier_instance
+    if _task_notifier_instance is None:
+        _task_notifier_instance = TaskNotifier(
+            db_tasks.tasks,
+            TASK_POLL_MIN_INTERVAL,
+            TASK_POLL_INTERVAL,
+            use_change_streams=TASK_CHANGE_STREAMS,
+        )
+    return _task_notifier_instance
+
+
 def get_task_service() -> ITaskService:
     global _task_repository_instance, _task_service_instance
     if _task_repository_instance is None:
         _task_repository_instance = TaskRepository()
     if _task_service_instance is None:
-        _task_service_instance = TaskService(_task_repository_instance)
+        _task_service_instance = TaskService(
+            _task_repository_instance, get_task_notifier()
+        )
     return _task_service_instance
+
+
+def get_search_pool() -> SearchPool:
+    global _search_pool_instance
+    if _search_pool_instance is None:
+        _search_pool_instance = SearchPool(SEARCH_POOL_WORKERS, SEARCH_TIMEOUT)
+    return _search_pool_instance
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter_instance
+    if _rate_limiter_instance is None:
+        _rate_limiter_instance = RateLimiter(
+            db_tasks.rate_buckets,
+            parse_rate_limits(SEARCH_RATE_LIMITS),
+            SEARCH_RATE_BURST,
+        )
+    return _rate_limiter_instance
+
+
+def get_invidious_client() -> InvidiousClient:
+    global _invidious_client_instance
+    if _invidious_client_instance is None:
+        _invidious_client_instance = InvidiousClient(
+            INVIDIOUS_INSTANCES,
+            INVIDIOUS_PAGE_TIMEOUT,
+            INVIDIOUS_CONCURRENCY,
+            INVIDIOUS_MAX_PAGES,
+        )
+    return _invidious_client_instance
+
+
+def get_metadata_batcher() -> MetadataBatcher:
+    global _metadata_batcher_instance
+    if _metadata_batcher_instance is None:
+        _metadata_batcher_instance = MetadataBatcher(
+            METADATA_BATCH_SIZE, METADATA_BATCH_WAIT_MS / 1000
+        )
+    return _metadata_batcher_instance
+
+
+def get_views_refresher() -> ViewsRefresher:
+    global _views_refresher_instance
+    if _views_refresher_instance is None:
+        _views_refresher_instance = ViewsRefresher(
+            get_video_service(),
+            VIEWS_REFRESH_BATCH,
+            VIEWS_REFRESH_PAUSE,
+            VIEWS_REFRESH_MAX_AGE,
+            VIEWS_REFRESH_IDLE,
+        )
+    return _views_refresher_instance
+
+
+def get_video_insert_buffer() -> VideoInsertBuffer:
+    global _video_insert_buffer_instance
+    if _video_insert_buffer_instance is None:
+        _video_insert_buffer_instance = VideoInsertBuffer(
+            db_client.videos, INSERT_BUFFER_SIZE, INSERT_BUFFER_WAIT_MS / 1000
+        )
+    return _video_insert_buffer_instance
+
+
+def get_profile_store() -> ProfileStore:
+    global _profile_store_instance
+    if _profile_store_instance is None:
+        _profile_store_instance = ProfileStore(PROFILING_DIR, PROFILING_MAX_STORED)
+    return _profile_store_instance
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    global _loop_monitor_instance
+    if _loop_monitor_instance is None:
+        _loop_monitor_instance = LoopLagMonitor(
+            LOOP_MONITOR_INTERVAL, LOOP_STALL_THRESHOLD, LOOP_STALL_HISTORY
+        )
+    return _loop_monitor_instance
@@ -0,0 +1,294 @@
+"""
+Registro de métricas en memoria expuesto en formato de texto de Prometheus
+(GET /metrics). Sin dependencias: contadores, gauges e histogramas con
+etiquetas, más recolectores asíncronos que calculan gauges al hacer scrape
+(p. ej. la profundidad de la cola de tareas).
+
+Las métricas son por proceso; con varios workers cada uno expone las suyas.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pares = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class _Metric:
+    tipo = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.tipo}"]
+
+
+class Counter(_Metric):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    tipo = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    tipo = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> [cuentas por bucket (no acumuladas) + overflow, suma, total]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            datos = self._values.get(key)
+            if datos is None:
+                datos = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            datos[0][bisect_left(self.buckets, value)] += 1
+            datos[1] += value
+            datos[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = [(key, (list(d[0]), d[1], d[2])) for key, d in self._values.items()]
+        for key, (cuentas, suma, total) in values:
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets, cuentas):
+                acumulado += cuenta
+                le = 'le="%s"' % limite
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {acumulado}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {suma}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+class _Timer:
+    """Context manager que observa la duración del bloque en un histograma."""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self._histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._inicio, **self.labels)
+        return False
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]):
+        """Corrutina que actualiza gauges justo antes de cada scrape."""
+        self._collectors.append(collector)
+
+    async def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                await collector()
+            except Exception as e:
+                print(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- API ---
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("method", "route")
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "Peticiones HTTP por ruta y código de estado", ("method", "route", "status")
+)
+
+# --- Event loop ---
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "Retraso de planificación del event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+EVENT_LOOP_STALLS = REGISTRY.counter(
+    "event_loop_stalls_total", "Bloqueos del event loop por encima de LOOP_STALL_THRESHOLD"
+)
+
+# --- Mongo ---
+MONGO_OPERATION_DURATION = REGISTRY.histogram(
+    "mongo_operation_duration_seconds",
+    "Duración de los métodos de los repositorios",
+    ("repository", "method", "outcome"),
+)
+
+MONGO_COMMAND_DURATION = REGISTRY.histogram(
+    "mongo_command_duration_seconds",
+    "Duración de cada comando enviado a Mongo por método de repositorio",
+    ("command", "operation"),
+)
+MONGO_SLOW_COMMANDS = REGISTRY.counter(
+    "mongo_slow_commands_total", "Comandos de Mongo por encima de MONGO_SLOW_MS", ("command", "operation")
+)
+
+# --- Scraper ---
+SCRAPER_PROVIDER_DURATION = REGISTRY.histogram(
+    "scraper_provider_duration_seconds", "Duración de cada estrategia de búsqueda", ("provider",)
+)
+SCRAPER_PROVIDER_OUTCOMES = REGISTRY.counter(
+    "scraper_provider_outcomes_total",
+    "Resultado de cada estrategia de búsqueda (ok, empty, error, timeout, rate_limited)",
+    ("provider", "outcome"),
+)
+METADATA_BATCH_DURATION = REGISTRY.histogram(
+    "metadata_batch_duration_seconds", "Duración de las consultas de metadatos por lotes"
+)
+METADATA_BATCH_SIZE = REGISTRY.histogram(
+    "metadata_batch_size", "Videos por lote de metadatos", buckets=(1, 2, 5, 10, 20, 30, 40, 50)
+)
+
+# --- Cola de tareas e ingesta ---
+TASK_QUEUE_DEPTH = REGISTRY.gauge("task_queue_depth", "Tareas por estado", ("status",))
+SEARCH_POOL_STATE = REGISTRY.gauge("search_pool_searches", "Búsquedas del pool por estado", ("state",))
+INGEST_VIDEOS = REGISTRY.counter(
+    "ingest_videos_total",
+    "Videos por etapa de la ingesta (found, filtered, scraped, inserted, rejected)",
+    ("stage",),
+)
+INGEST_STAGE_DURATION = REGISTRY.histogram(
+    "ingest_stage_duration_seconds",
+    "Duración de las etapas de la ingesta por búsqueda",
+    ("stage",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+
+# --- Bots ---
+BOT_COMMAND_DURATION = REGISTRY.histogram(
+    "bot_command_duration_seconds", "Latencia de los comandos de los bots", ("bot", "command")
+)
+
+
+# Método de repositorio en curso ("VideoRepository.get_random_video"). Motor
+# copia el contexto al hilo de su executor, así que los listeners de comandos
+# de pymongo lo ven y pueden atribuir cada comando a su método.
+CURRENT_OPERATION: contextvars.ContextVar = contextvars.ContextVar(
+    "current_repository_operation", default=None
+)
+
+
+def instrument_repository(cls):
+    """
+    Decorador de clase: mide cada método asíncrono público del repositorio en
+    MONGO_OPERATION_DURATION con el nombre de la clase y del método, y lo deja
+    en CURRENT_OPERATION mientras se ejecuta.
+    """
+    repository = cls.__name__
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not asyncio.iscoroutinefunction(attr):
+            continue
+
+        def envolver(metodo, name=name):
+            @functools.wraps(metodo)
+            async def medido(*args, **kwargs):
+                token = CURRENT_OPERATION.set(f"{repository}.{name}")
+                inicio = time.perf_counter()
+                outcome = "error"
+                try:
+                    resultado = await metodo(*args, **kwargs)
+                    outcome = "ok"
+                    return resultado
+                finally:
+                    MONGO_OPERATION_DURATION.observe(
+                        time.perf_counter() - inicio,
+                        repository=repository,
+                        method=name,
+                        outcome=outcome,
+                    )
+                    CURRENT_OPERATION.reset(token)
+
+            return medido
+
+        setattr(cls, name, envolver(attr))
+    return cls
@@ -0,0 +1,182 @@
+import asyncio
+import random
+import time
+
+import aiohttp
+
+
+class EstadoInstancia:
+    """
+    Latencia (media móvil exponencial) y errores recientes de una instancia.
+    Tras varios fallos seguidos la instancia queda en pausa un tiempo que
+    crece exponencialmente; un acierto la rehabilita.
+    """
+
+    ALFA = 0.3
+    PAUSA_BASE = 30
+    PAUSA_MAXIMA = 600
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latencia = None
+        self.errores = 0
+        self.pausada_hasta = 0.0
+        self.en_curso = 0
+
+    def exito(self, segundos: float):
+        if self.latencia is None:
+            self.latencia = segundos
+        else:
+            self.latencia = self.ALFA * segundos + (1 - self.ALFA) * self.latencia
+        self.errores = 0
+        self.pausada_hasta = 0.0
+
+    def fallo(self):
+        self.errores += 1
+        if self.errores >= 2:
+            pausa = min(self.PAUSA_BASE * 2 ** (self.errores - 2), self.PAUSA_MAXIMA)
+            self.pausada_hasta = time.monotonic() + pausa
+
+    def disponible(self, ahora: float) -> bool:
+        return ahora >= self.pausada_hasta
+
+    def coste(self) -> float:
+        # Las instancias sin medir tienen coste 0 para que se prueben pronto;
+        # las peticiones en curso penalizan para repartir la carga
+        latencia = self.latencia or 0.0
+        return latencia * (1 + self.errores) * (1 + self.en_curso)
+
+    def estado(self) -> dict:
+        return {
+            "url": self.url,
+            "latency": round(self.latencia, 3) if self.latencia is not None else None,
+            "errors": self.errores,
+            "paused": not self.disponible(time.monotonic()),
+            "in_flight": self.en_curso,
+        }
+
+
+class InvidiousClient:
+    """
+    Cliente asíncrono de la API de búsqueda de Invidious repartido entre
+    varias instancias. Las páginas se piden en paralelo y cada una va a la
+    instancia disponible con menor coste (latencia, errores y carga); si falla
+    se reintenta en otra. Los resultados se deduplican según llegan.
+    """
+
+    def __init__(self, instances, page_timeout: float, concurrency: int, max_pages: int):
+        if not instances:
+            raise ValueError("Se necesita al menos una instancia de Invidious")
+        self._instancias = [EstadoInstancia(url.rstrip("/")) for url in instances]
+        self.page_timeout = page_timeout
+        self.max_pages = max_pages
+        self._semaforo = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    def _sesion(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.page_timeout)
+            )
+        return self._session
+
+    def _elegir(self, descartadas):
+        ahora = time.monotonic()
+        candidatas = [
+            i for i in self._instancias if i.url not in descartadas and i.disponible(ahora)
+        ]
+        if not candidatas:
+            # Todas en pausa: mejor probar la que antes se rehabilite que no pedir nada
+            candidatas = [i for i in self._instancias if i.url not in descartadas]
+            if not candidatas:
+                return None
+            return min(candidatas, key=lambda i: i.pausada_hasta)
+        menor = min(i.coste() for i in candidatas)
+        # Desempate aleatorio para no cargar siempre la misma entre iguales
+        return random.choice([i for i in candidatas if i.coste() == menor])
+
+    async def _pedir_pagina(self, busqueda: str, pagina: int, orden: str, presupuesto=None):
+        """Devuelve la lista de videos de una página o lanza la última excepción."""
+        if presupuesto:
+            await presupuesto()
+        descartadas = set()
+        ultimo_error = None
+        while True:
+            instancia = self._elegir(descartadas)
+            if instancia is None:
+                raise ultimo_error or RuntimeError("Sin instancias de Invidious")
+            descartadas.add(instancia.url)
+
+            params = {"q": busqueda, "page": pagina, "type": "video", "sort": orden}
+            instancia.en_curso += 1
+            inicio = time.monotonic()
+            try:
+                async with self._semaforo:
+                    async with self._sesion().get(
+                        f"{instancia.url}/api/v1/search", params=params
+                    ) as response:
+                        if response.status != 200:
+                            raise RuntimeError(f"{instancia.url}: status {response.status}")
+                        datos = await response.json(content_type=None)
+                instancia.exito(time.monotonic() - inicio)
+                return datos or []
+            except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, ValueError) as e:
+                instancia.fallo()
+                ultimo_error = e
+            finally:
+                instancia.en_curso -= 1
+
+    async def buscar(self, busqueda: str, cantidad: int, recientes: bool = False, presupuesto=None):
+        """
+        Generador asíncrono que produce listas de videos (dicts de la API)
+        sin repetir videoId. Las páginas se piden todas a la vez pero se
+        entregan en orden (1, 2, 3...): quien consume corta la búsqueda en la
+        primera página ya conocida, y con sort=upload_date una página tardía
+        que llegara antes haría perder los videos más nuevos. Lanza la última
+        excepción si todas las páginas fallan y no hubo ningún resultado.
+
+        `presupuesto` (corrutina opcional) se espera antes de pedir cada página.
+        """
+        # Invidious devuelve unos 20 resultados por página
+        paginas = max(1, min(self.max_pages, -(-cantidad // 20)))
+        orden = "upload_date" if recientes else "relevance"
+        pendientes = [
+            asyncio.create_task(self._pedir_pagina(busqueda, n, orden, presupuesto))
+            for n in range(1, paginas + 1)
+        ]
+        vistos = set()
+        error = None
+        try:
+            # Las tareas ya corren en paralelo: esperar en orden solo retiene
+            # las páginas que terminan antes que las anteriores
+            for tarea in pendientes:
+                try:
+                    datos = await tarea
+                except Exception as e:
+                    error = e
+                    continue
+                nuevos = []
+                for video in datos:
+                    video_id = video.get("videoId")
+                    if video_id and video_id not in vistos:
+                        vistos.add(video_id)
+                        nuevos.append(video)
+                if nuevos:
+                    yield nuevos
+                if len(vistos) >= cantidad:
+                    return
+        finally:
+            # Al cortar antes de tiempo quedan páginas en curso o ya fallidas:
+            # se cancelan y se recogen para que no avisen de excepciones sin leer
+            for tarea in pendientes:
+                tarea.cancel()
+            await asyncio.gather(*pendientes, return_exceptions=True)
+        if not vistos and error:
+            raise error
+
+    def estado(self) -> list:
+        return [i.estado() for i in self._instancias]
+
+    async def cerrar(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
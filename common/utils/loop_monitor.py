@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import List, Optional
+
+from common.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+
+class LoopLagMonitor:
+    """
+    Mide de forma continua el retraso de planificación del event loop y
+    localiza las llamadas que lo bloquean (requests, yt_dlp, time.sleep o un
+    print a un stdout lento ejecutados en el loop).
+
+    - Una tarea duerme `interval` segundos y mide cuánto tarda de más en
+      despertar; ese retraso va a EVENT_LOOP_LAG.
+    - Un hilo watchdog comprueba el último latido de esa tarea. Si el loop
+      lleva más de `threshold` segundos sin latir, captura con
+      sys._current_frames la pila del hilo del loop, es decir, la del callback
+      que lo está bloqueando, y la guarda y escribe en el log (una vez por
+      bloqueo).
+    """
+
+    def __init__(self, interval: float, threshold: float, history: int):
+        self.interval = interval
+        self.threshold = threshold
+        self._bloqueos = deque(maxlen=history)
+        self._latido = time.monotonic()
+        self._hilo_loop: Optional[int] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+
+    def start(self):
+        if self._tarea is not None:
+            return
+        self._hilo_loop = threading.get_ident()
+        self._latido = time.monotonic()
+        self._parar.clear()
+        self._tarea = asyncio.create_task(self._medir())
+        self._watchdog = threading.Thread(target=self._vigilar, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._parar.set()
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, 1)
+            self._watchdog = None
+
+    async def _medir(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            inicio = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - inicio - self.interval)
+            self._latido = time.monotonic()
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+
+    def _vigilar(self):
+        capturado = None
+        while not self._parar.wait(self.interval / 2):
+            latido = self._latido
+            bloqueado = time.monotonic() - latido - self.interval
+            if bloqueado < self.threshold:
+                continue
+            # Un solo informe por bloqueo: se identifica por el último latido
+            if capturado == latido:
+                continue
+            capturado = latido
+            frame = sys._current_frames().get(self._hilo_loop)
+            if frame is None:
+                continue
+            pila = "".join(traceback.format_stack(frame))
+            del frame
+            EVENT_LOOP_STALLS.inc()
+            self._bloqueos.append(
+                {"detected_at": time.time(), "blocked_for": round(bloqueado, 3), "stack": pila}
+            )
+            print(f"⚠️ Event loop blocked for {bloqueado:.2f}s, running:\n{pila}", flush=True)
+
+    def bloqueos(self) -> List[dict]:
+        """Bloqueos detectados, el más reciente primero."""
+        return list(reversed(self._bloqueos))
+
+    def estado(self) -> dict:
+        return {
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "last_lag": round(self.last_lag, 4),
+            "max_lag": round(self.max_lag, 4),
+            "stalls": len(self._bloqueos),
+        }
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from common.metrics import METADATA_BATCH_DURATION, METADATA_BATCH_SIZE
+from common.utils.scriptscrapper import (
+    MAX_IDS_POR_PETICION,
+    obtener_datos_youtube,
+    obtener_datos_youtube_lote,
+)
+
+
+class MetadataBatcher:
+    """
+    Agrupa las consultas de metadatos de publicaciones concurrentes en
+    micro-lotes. Cada lote se envía cuando alcanza `max_batch` ids o cuando
+    pasan `max_wait` segundos desde el primer id pendiente, con una sola
+    petición a los proveedores que aceptan listas de ids. Los videos que esos
+    proveedores no devuelven se resuelven uno a uno con el scraper completo.
+
+    Varias llamadas concurrentes con el mismo id comparten el resultado.
+    """
+
+    def __init__(self, max_batch: int = MAX_IDS_POR_PETICION, max_wait: float = 0.005):
+        self.max_batch = min(max_batch, MAX_IDS_POR_PETICION)
+        self.max_wait = max_wait
+        self._pendientes = {}
+        self._temporizador = None
+        self._lotes = set()
+
+    async def obtener(self, video_id: str) -> dict:
+        """Devuelve los datos del video; lanza ValueError si no se pudieron obtener."""
+        future = self._pendientes.get(video_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pendientes[video_id] = future
+            if len(self._pendientes) >= self.max_batch:
+                self._vaciar()
+            elif self._temporizador is None:
+                self._temporizador = asyncio.get_running_loop().call_later(
+                    self.max_wait, self._vaciar
+                )
+        # shield: si un llamante se cancela, los demás que esperan el mismo id siguen
+        return await asyncio.shield(future)
+
+    def _vaciar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if not self._pendientes:
+            return
+        lote, self._pendientes = self._pendientes, {}
+        tarea = asyncio.ensure_future(self._resolver(lote))
+        # Referencia fuerte hasta que termine para que no la recoja el GC
+        self._lotes.add(tarea)
+        tarea.add_done_callback(self._lotes.discard)
+
+    async def _resolver(self, lote: dict):
+        inicio = time.perf_counter()
+        try:
+            resultados = await asyncio.to_thread(obtener_datos_youtube_lote, list(lote))
+        except Exception:
+            resultados = {}
+        METADATA_BATCH_DURATION.observe(time.perf_counter() - inicio)
+        METADATA_BATCH_SIZE.observe(len(lote))
+
+        faltan = [video_id for video_id in lote if video_id not in resultados]
+        for video_id, datos in resultados.items():
+            if not lote[video_id].done():
+                lote[video_id].set_result(datos)
+
+        async def individual(video_id):
+            future = lote[video_id]
+            try:
+                datos = await asyncio.to_thread(obtener_datos_youtube, video_id)
+                if not datos:
+                    raise ValueError("No se pudieron obtener los datos del video de YouTube.")
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(datos)
+
+        await asyncio.gather(*(individual(video_id) for video_id in faltan))
+
+    async def cerrar(self):
+        """Envía lo pendiente y espera a que terminen los lotes en curso."""
+        self._vaciar()
+        if self._lotes:
+            await asyncio.gather(*self._lotes, return_exceptions=True)
@@ -0,0 +1,164 @@
+"""
+Perfilado de peticiones bajo demanda con pyinstrument (dependencia opcional).
+
+El middleware solo se instala con PROFILING_ENABLED, así que deshabilitado no
+añade ningún coste. Instalado, perfila:
+
+- las peticiones con la cabecera `X-Profile: 1` y un `X-Admin-Token` válido;
+- una fracción aleatoria (PROFILING_SAMPLE_RATE) del resto.
+
+Se usa el modo asíncrono de pyinstrument: el tiempo que la petición pasa
+esperando (Mongo, asyncio.to_thread con el scraper síncrono...) aparece como
+`await` en la línea que espera, y el código que bloquea el loop aparece con su
+propia pila. La conversión de pydantic de FastAPI ocurre dentro de la
+petición, así que también queda en el perfil.
+
+Cada perfil se guarda en HTML en PROFILING_DIR y la respuesta lleva su id en
+la cabecera `X-Profile-Id` para descargarlo desde /admin/profiles/{id}.
+"""
+import asyncio
+import hmac
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from common.utils.genid import gen_id
+
+# Rutas que no se muestrean: perfilarlas solo añade ruido
+RUTAS_EXCLUIDAS = ("/metrics", "/admin")
+
+# Streams SSE (/tasks/{id}/events): duran lo que dure la conexión, así que
+# no se perfilan nunca, ni siquiera con la cabecera
+SUFIJOS_STREAMING = ("/events",)
+
+
+class ProfileStore:
+    """Guarda los últimos `max_stored` perfiles en disco; los más antiguos se borran."""
+
+    def __init__(self, directory: str, max_stored: int):
+        self.directory = directory
+        self.max_stored = max_stored
+        self._perfiles: "OrderedDict[str, dict]" = OrderedDict()
+
+    def ruta(self, profile_id: str) -> Optional[str]:
+        # Solo ids conocidos: el id llega desde la URL
+        if profile_id not in self._perfiles:
+            return None
+        return os.path.join(self.directory, f"{profile_id}.html")
+
+    def listar(self) -> List[dict]:
+        return list(reversed(self._perfiles.values()))
+
+    async def guardar(self, profile_id: str, info: dict, profiler):
+        # Renderizar el HTML es CPU puro: se hace fuera del loop
+        html = await asyncio.to_thread(profiler.output_html)
+
+        def escribir():
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{profile_id}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+
+        await asyncio.to_thread(escribir)
+        self._perfiles[profile_id] = {"id": profile_id, **info}
+        while len(self._perfiles) > self.max_stored:
+            antiguo, _ = self._perfiles.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.directory, f"{antiguo}.html"))
+            except OSError:
+                pass
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware) para que la aplicación se
+    ejecute en la misma tarea que el profiler. pyinstrument no admite varios
+    perfiles a la vez en el mismo hilo, así que se perfila una petición cada
+    vez; las que coinciden con otra en curso se sirven sin perfilar.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float, interval: float, admin_token: str):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.admin_token = admin_token
+        self._activo = False
+        self._guardados = set()
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ pyinstrument no instalado: el perfilado de peticiones queda deshabilitado.")
+            Profiler = None
+        self._profiler_cls = Profiler
+
+    def _debe_perfilar(self, scope) -> bool:
+        if scope["path"].endswith(SUFIJOS_STREAMING):
+            return False
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") == b"1":
+            token = headers.get(b"x-admin-token", b"").decode("latin-1")
+            return bool(self.admin_token) and hmac.compare_digest(token, self.admin_token)
+        if self.sample_rate <= 0 or scope["path"].startswith(RUTAS_EXCLUIDAS):
+            return False
+        return random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or self._profiler_cls is None
+            or self._activo
+            or not self._debe_perfilar(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = gen_id()
+        status = None
+        descartado = False
+
+        async def send_con_id(message):
+            nonlocal status, descartado
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if content_type.startswith(b"text/event-stream"):
+                    # Cualquier otro stream: se descarta el perfil y se libera
+                    # el profiler sin esperar a que se cierre la conexión
+                    descartado = True
+                    profiler.stop()
+                    self._activo = False
+                    await send(message)
+                    return
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())],
+                }
+            await send(message)
+
+        self._activo = True
+        profiler = self._profiler_cls(interval=self.interval, async_mode="enabled")
+        inicio = time.time()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_con_id)
+        finally:
+            if not descartado:
+                profiler.stop()
+                self._activo = False
+                self._guardar(profile_id, scope, status, inicio, profiler)
+
+    def _guardar(self, profile_id: str, scope, status, inicio: float, profiler):
+        info = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status": status,
+            "duration_ms": round((time.time() - inicio) * 1000, 1),
+            "created_at": inicio,
+        }
+        # Se guarda en segundo plano para no retrasar el final de la respuesta
+        tarea = asyncio.create_task(self.store.guardar(profile_id, info, profiler))
+        self._guardados.add(tarea)
+        tarea.add_done_callback(self._guardados.discard)
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+class PresupuestoAgotado(Exception):
+    """No se consiguió un token del proveedor antes del timeout."""
+
+
+class SharedTokenBucket:
+    """
+    Token bucket guardado en Mongo, compartido por todos los workers y nodos.
+
+    Cada documento guarda los tokens disponibles y la fecha de la última
+    actualización; la recarga y el consumo se hacen en un único
+    find_one_and_update con pipeline, así que es atómico entre procesos.
+    """
+
+    def __init__(self, collection, name: str, rate_per_minute: float, capacity: float):
+        self._collection = collection
+        self.name = name
+        self._rate = rate_per_minute / 60.0
+        self._capacity = capacity
+
+    async def _try_take(self) -> float:
+        """Consume un token si hay; si no, devuelve los segundos a esperar."""
+        now = datetime.now(timezone.utc)
+        refilled = {
+            "$min": [
+                self._capacity,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", self._capacity]},
+                        {
+                            "$multiply": [
+                                {
+                                    "$divide": [
+                                        {"$subtract": [now, {"$ifNull": ["$updated_at", now]}]},
+                                        1000,
+                                    ]
+                                },
+                                self._rate,
+                            ]
+                        },
+                    ]
+                },
+            ]
+        }
+        try:
+            bucket = await self._upsert(now, refilled)
+        except DuplicateKeyError:
+            # Dos procesos crearon el bucket a la vez: el documento ya existe
+            bucket = await self._upsert(now, refilled)
+        if bucket["granted"]:
+            return 0
+        return (1 - bucket["tokens"]) / self._rate
+
+    async def _upsert(self, now: datetime, refilled: dict) -> dict:
+        return await self._collection.find_one_and_update(
+            {"_id": self.name},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {
+                    "$set": {
+                        "granted": {"$gte": ["$tokens", 1]},
+                        "tokens": {
+                            "$cond": [
+                                {"$gte": ["$tokens", 1]},
+                                {"$subtract": ["$tokens", 1]},
+                                "$tokens",
+                            ]
+                        },
+                    }
+                },
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Espera a tener un token; devuelve False si no llega antes del timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        while True:
+            wait = await self._try_take()
+            if wait <= 0:
+                return True
+            if deadline is not None and loop.time() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class TokenBucket:
+    """Token bucket en memoria, para límites locales de un solo proceso."""
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self._rate = rate_per_minute / 60.0
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def try_take(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class KeyedTokenBuckets:
+    """
+    Un TokenBucket por clave (sala, usuario...). Solo se conservan los
+    `max_keys` usados más recientemente; una clave olvidada vuelve llena.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float, max_keys: int = 10000):
+        self._rate = rate_per_minute
+        self._capacity = capacity
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def try_take(self, key: str) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self._rate, self._capacity)
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket.try_take()
+
+
+class RateLimiter:
+    """Conjunto de buckets por proveedor; los proveedores sin límite no esperan."""
+
+    def __init__(self, collection, limits: Dict[str, float], burst: float):
+        self._buckets = {
+            name: SharedTokenBucket(collection, name, rate, max(1, burst))
+            for name, rate in limits.items()
+        }
+
+    async def acquire(self, provider: str, timeout: Optional[float] = None) -> bool:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            return True
+        return await bucket.acquire(timeout)
+
+    async def consumir(self, provider: str, timeout: Optional[float] = None):
+        """Como acquire, pero lanza PresupuestoAgotado si no hay token a tiempo."""
+        if not await self.acquire(provider, timeout):
+            raise PresupuestoAgotado(provider)
+
+
+def parse_rate_limits(value: str) -> Dict[str, float]:
+    """Convierte 'ytdlp:30,invidious:20' en {'ytdlp': 30.0, 'invidious': 20.0}."""
+    limits = {}
+    for item in value.split(","):
+        if ":" not in item:
+            continue
+        name, rate = item.split(":", 1)
+        try:
+            limits[name.strip()] = float(rate)
+        except ValueError:
+            continue
+    return limits
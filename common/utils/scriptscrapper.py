@@ -3,22 +3,91 @@ from bs4 import BeautifulSoup
 import json
 from datetime import datetime
 
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+
+# Proveedores compatibles con la YouTube Data API: aceptan hasta 50 ids por petición
+MAX_IDS_POR_PETICION = 50
+PROVEEDORES_API = (
+    (
+        "https://ytapi.apps.mattw.io/v3/videos",
+        {"key": "foo1", "quotaUser": "ezb2mV0zCUgcJoUiwI6V2qTarCG3uBXX1GBofjgM"},
+    ),
+    ("https://yt.lemnoslife.com/videos", {}),
+)
+
+
+def safe_int(value, default=0):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def safe_date(value):
+    try:
+        if value:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except Exception:
+        pass
+    return None
+
+
+def _datos_desde_item_api(item):
+    """Convierte un item de /videos (snippet, statistics) o devuelve None si está incompleto."""
+    snippet = item.get("snippet", {})
+    stats = item.get("statistics", {})
+
+    titulo = snippet.get("title")
+    fecha_subida = safe_date(snippet.get("publishedAt"))
+    etiquetas = snippet.get("tags") or []
+    # Sin default: un item sin statistics (vistas ocultas o respuesta parcial)
+    # se trata como incompleto y se resuelve con obtener_datos_youtube
+    vistas = safe_int(stats.get("viewCount"), default=None)
+
+    if titulo and fecha_subida and vistas is not None:
+        return {
+            "titulo": titulo,
+            "fecha_subida": fecha_subida,
+            "tags": etiquetas,
+            "views": vistas,
+        }
+    return None
+
+
+def obtener_datos_youtube_lote(video_ids):
+    """
+    Pide los datos de varios videos a los proveedores compatibles con la Data
+    API, en peticiones de hasta 50 ids separados por comas. Devuelve un dict
+    {video_id: datos} solo con los videos encontrados; los que falten deben
+    resolverse uno a uno con obtener_datos_youtube.
+    """
+    resultados = {}
+    for base_url, params in PROVEEDORES_API:
+        pendientes = [v for v in video_ids if v not in resultados]
+        for inicio in range(0, len(pendientes), MAX_IDS_POR_PETICION):
+            lote = pendientes[inicio:inicio + MAX_IDS_POR_PETICION]
+            try:
+                resp = requests.get(
+                    base_url,
+                    params={**params, "part": "snippet,statistics", "id": ",".join(lote)},
+                    headers=HEADERS,
+                    timeout=10,
+                )
+                if resp.status_code != 200:
+                    continue
+                for item in resp.json().get("items", []):
+                    datos = _datos_desde_item_api(item)
+                    if datos and item.get("id") in lote:
+                        resultados[item["id"]] = datos
+            except Exception:
+                continue
+        if len(resultados) == len(video_ids):
+            break
+    return resultados
+
+
 def obtener_datos_youtube(video_id):
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-
-    def safe_int(value, default=0):
-        try:
-            return int(value)
-        except (ValueError, TypeError):
-            return default
-
-    def safe_date(value):
-        try:
-            if value:
-                return datetime.fromisoformat(value.replace("Z", "+00:00"))
-        except Exception:
-            pass
-        return None
+    headers = HEADERS
 
     # --- MÉTODO 1: SCRAPING DIRECTO (original) ---
     try:
@@ -75,22 +144,9 @@ def obtener_datos_youtube(video_id):
             data = resp.json()
             items = data.get("items", [])
             if items:
-                item = items[0]
-                snippet = item.get("snippet", {})
-                stats = item.get("statistics", {})
-
-                titulo = snippet.get("title")
-                fecha_subida = safe_date(snippet.get("publishedAt"))
-                etiquetas = snippet.get("tags") or []
-                vistas = safe_int(stats.get("viewCount"))
-
-                if titulo and fecha_subida and vistas is not None:
-                    return {
-                        "titulo": titulo,
-                        "fecha_subida": fecha_subida,
-                        "tags": etiquetas,
-                        "views": vistas,
-                    }
+                datos = _datos_desde_item_api(items[0])
+                if datos:
+                    return datos
     except Exception:
         pass
 
@@ -131,22 +187,9 @@ def obtener_datos_youtube(video_id):
             data = resp.json()
             items = data.get("items", [])
             if items:
-                item = items[0]
-                snippet = item.get("snippet", {})
-                stats = item.get("statistics", {})
-
-                titulo = snippet.get("title")
-                fecha_subida = safe_date(snippet.get("publishedAt"))
-                etiquetas = snippet.get("tags") or []
-                vistas = safe_int(stats.get("viewCount"))
-
-                if titulo and fecha_subida and vistas is not None:
-                    return {
-                        "titulo": titulo,
-                        "fecha_subida": fecha_subida,
-                        "tags": etiquetas,
-                        "views": vistas,
-                    }
+                datos = _datos_desde_item_api(items[0])
+                if datos:
+                    return datos
     except Exception:
         
 
@@ -1,212 +1,722 @@
 import json
 import yt_dlp
-import requests
 import time
 import re
 import argparse
 import sys
 import os
 import asyncio
-
-from common.config import SEARCH_NUMBER
+import inspect
+import hashlib
+import concurrent.futures
+from contextlib import aclosing
+
+from common.config import SEARCH_NUMBER, LIMIT_VIEWS, SEARCH_RATE_THREAD_WAIT
+from common.config import ARCHIVE_MAX_AGE, ARCHIVE_INCREMENTAL, INGEST_PUBLISH_CONCURRENCY
+from common.ioc import get_search_pool, get_rate_limiter, get_invidious_client, get_video_insert_buffer
+from common.metrics import SCRAPER_PROVIDER_DURATION, SCRAPER_PROVIDER_OUTCOMES, INGEST_VIDEOS, INGEST_STAGE_DURATION
+from common.utils.search_archive import cargar_archivo, guardar_archivo, es_reciente
+from common.utils.rate_limiter import PresupuestoAgotado
 
 # --- 1. CONFIGURACIÓN Y UTILIDADES ---
 
-INVIDIOUS_INSTANCES = [
-    "https://yewtu.be",
-]
-
 def limpiar_nombre_archivo(texto):
     """
     Limpia la palabra clave para que pueda ser usada como un nombre de archivo válido.
     """
     # Reemplaza caracteres no alfanuméricos por espacios, elimina espacios extra y une con guiones
     texto_limpio = re.sub(r'[^\w\s-]', '', texto).strip()
-    return re.sub(r'[-\s]+', '-', texto_limpio).lower()
+    nombre = re.sub(r'[-\s]+', '-', texto_limpio).lower()
+    if not re.search(r'\w', nombre):
+        # Solo signos de puntuación: sin esto todas compartirían "yt-.json.gz"
+        return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+    return nombre
+
+
+# --- 2. CANDIDATOS ---
+
+PATRON_ID = re.compile(r"(?:v=|\/)([0-9A-Za-z_-]{11})")
+
+
+def crear_candidato(video_id, titulo=None, views=None, duracion=None):
+    """
+    Representa un resultado de búsqueda con los metadatos que la estrategia
+    haya podido obtener sin scrapear el video (None si no se conocen).
+    """
+    return {
+        "video_id": video_id,
+        "titulo": titulo,
+        "views": views,
+        "duracion": duracion,
+    }
+
+
+def extraer_id(url):
+    match = PATRON_ID.search(url or "")
+    return match.group(1) if match else None
+
+
+def _a_entero(valor):
+    """Convierte '1,234 views', '1.234' o 1234 a entero; None si no se puede."""
+    if valor is None:
+        return None
+    if isinstance(valor, int):
+        return valor
+    digitos = re.sub(r"[^\d]", "", str(valor))
+    if digitos:
+        return int(digitos)
+    # "No views" / "Sin visualizaciones"
+    if "no " in str(valor).lower() or "sin " in str(valor).lower():
+        return 0
+    return None
+
+
+def _duracion_a_segundos(valor):
+    """Convierte '1:02:03' o 3723 a segundos; None si no se puede."""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return int(valor)
+    try:
+        segundos = 0
+        for parte in str(valor).split(":"):
+            segundos = segundos * 60 + int(parte)
+        return segundos
+    except ValueError:
+        return None
 
 
-# --- 2. ESTRATEGIAS DE BÚSQUEDA ---
+def dentro_del_limite(candidato, limite=LIMIT_VIEWS):
+    """Los candidatos sin visitas conocidas se consideran dentro del límite."""
+    return candidato["views"] is None or candidato["views"] <= limite
 
-def estrategia_ytdlp(busqueda, cantidad):
+
+def filtrar_por_vistas(candidatos, limite=LIMIT_VIEWS):
+    """
+    Descarta los candidatos que ya sabemos que superan el límite de visitas,
+    antes de gastar un scrapeo en ellos. Los que no traen visitas se mantienen.
+    """
+    validos = [c for c in candidatos if dentro_del_limite(c, limite)]
+    descartados = len(candidatos) - len(validos)
+    if descartados:
+        print(f"🧹 Descartados {descartados} candidatos con más de {limite} visitas.")
+    return validos
+
+
+# --- 3. ESTRATEGIAS DE BÚSQUEDA ---
+# Cada estrategia es un generador que produce una lista de candidatos por
+# página, para poder publicar mientras se sigue buscando. `presupuesto` se
+# llama antes de cada petición a YouTube/Invidious para descontarla del
+# límite del proveedor (lanza PresupuestoAgotado si no hay token a tiempo);
+# las estrategias bloqueantes le pasan `cancelado` para dejar de esperar.
+
+TAMANO_PAGINA_YTDLP = 20
+
+
+def estrategia_ytdlp(busqueda, cantidad, recientes=False, presupuesto=None, cancelado=None):
     print(f"🔹 [Nivel 1] Buscando con yt-dlp: '{busqueda}'")
     ydl_opts = {"quiet": True, "extract_flat": True, "force_generic_extractor": False}
-    query = f"ytsearch{cantidad}:{busqueda}"
-    links = []
+    # ytsearchdate ordena por fecha de subida, los más nuevos primero
+    prefijo = "ytsearchdate" if recientes else "ytsearch"
+    query = f"{prefijo}{cantidad}:{busqueda}"
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        result = ydl.extract_info(query, download=False)
-        if "entries" in result:
-            for entry in result["entries"]:
-                if "url" in entry:
-                    links.append(entry["url"])
-                elif "id" in entry:
-                    links.append(f"https://www.youtube.com/watch?v={entry['id']}")
-    return links
+        # process=False deja "entries" como generador perezoso: yt-dlp pide
+        # cada página de resultados a YouTube según se va iterando
+        if presupuesto:
+            presupuesto(cancelado)
+        result = ydl.extract_info(query, download=False, process=False)
+        entradas = iter(result.get("entries") or [])
+        pagina = []
+        leidas = 0
+        while True:
+            # Pasado cada bloque de TAMANO_PAGINA_YTDLP, yt-dlp pide la siguiente página
+            if presupuesto and leidas and leidas % TAMANO_PAGINA_YTDLP == 0 and leidas < cantidad:
+                presupuesto(cancelado)
+            entry = next(entradas, None)
+            if entry is None:
+                break
+            leidas += 1
+            if cancelado and cancelado.is_set():
+                return
+            video_id = entry.get("id") or extraer_id(entry.get("url"))
+            if not video_id:
+                continue
+            pagina.append(
+                crear_candidato(
+                    video_id,
+                    titulo=entry.get("title"),
+                    views=entry.get("view_count"),
+                    duracion=_duracion_a_segundos(entry.get("duration")),
+                )
+            )
+            if len(pagina) >= TAMANO_PAGINA_YTDLP:
+                yield pagina
+                pagina = []
+        if pagina:
+            yield pagina
 
 
-def estrategia_libreria_python(busqueda, cantidad):
+def estrategia_libreria_python(busqueda, cantidad, recientes=False, presupuesto=None, cancelado=None):
     print(f"🔸 [Nivel 2] Buscando con youtube-search-python: '{busqueda}'")
     try:
-        from youtubesearchpython import VideosSearch
+        from youtubesearchpython import CustomSearch, VideosSearch, VideoSortOrder
     except ImportError:
         print("⚠️ Librería youtubesearchpython no instalada.")
-        return []
+        return
 
-    search = VideosSearch(busqueda, limit=cantidad)
-    links = []
+    # El constructor ya hace la primera petición
+    if presupuesto:
+        presupuesto(cancelado)
+    if recientes:
+        search = CustomSearch(busqueda, VideoSortOrder.uploadDate, limit=cantidad)
+    else:
+        search = VideosSearch(busqueda, limit=cantidad)
+    total = 0
     intentos = 0
-    while len(links) < cantidad and intentos < 10:
+    while total < cantidad and intentos < 10:
+        if cancelado and cancelado.is_set():
+            break
         results = search.result().get("result", [])
         if not results:
             break
+        pagina = []
         for video in results:
-            links.append(video["link"])
-            
-        if len(links) < cantidad:
+            video_id = video.get("id") or extraer_id(video.get("link"))
+            if not video_id:
+                continue
+            pagina.append(
+                crear_candidato(
+                    video_id,
+                    titulo=video.get("title"),
+                    views=_a_entero((video.get("viewCount") or {}).get("text")),
+                    duracion=_duracion_a_segundos(video.get("duration")),
+                )
+            )
+        total += len(pagina)
+        yield pagina
+
+        if total < cantidad:
+            if presupuesto:
+                presupuesto(cancelado)
             try:
                 search.next()
                 intentos += 1
                 time.sleep(0.20)
             except:
                 break
-    return links
 
 
-def estrategia_invidious(busqueda, cantidad):
+async def estrategia_invidious(busqueda, cantidad, recientes=False, presupuesto=None):
+    """
+    A diferencia de las anteriores es asíncrona: el cliente pide las páginas
+    en paralelo repartidas entre las instancias configuradas.
+    """
     print(f"🔻 [Nivel 3] Buscando con API Invidious: '{busqueda}'")
-    links = []
-    for instance in INVIDIOUS_INSTANCES:
-        try:
-            page = 1
-            more_results = True
-            while len(links) < cantidad and more_results:
-                response = requests.get(
-                    f"{instance}/api/v1/search",
-                    params={
-                        "q": busqueda,
-                        "page": page,
-                        "type": "video",
-                        "sort": "relevance",
-                    },
-                    timeout=10,
+    try:
+        async for videos in get_invidious_client().buscar(busqueda, cantidad, recientes, presupuesto):
+            yield [
+                crear_candidato(
+                    video["videoId"],
+                    titulo=video.get("title"),
+                    views=_a_entero(video.get("viewCount")),
+                    duracion=_duracion_a_segundos(video.get("lengthSeconds")),
                 )
-                if response.status_code == 200:
-                    data = response.json()
-                    if not data:
-                        more_results = False
-                        break
-                    for video in data:
-                        if video.get("videoId"):
-                            links.append(
-                                f"https://www.youtube.com/watch?v={video.get('videoId')}"
+                for video in videos
+            ]
+    except PresupuestoAgotado:
+        raise
+    except Exception as e:
+        raise Exception(f"Fallo total en Invidious: {e}") from e
+
+
+# (proveedor, estrategia): el proveedor es la clave de su presupuesto en el limitador
+ESTRATEGIAS = (
+    ("ytdlp", estrategia_ytdlp),
+    ("ytsearch", estrategia_libreria_python),
+    ("invidious", estrategia_invidious),
+)
+
+
+async def _con_timeout(generador, timeout):
+    """Aplica a un generador asíncrono un tiempo máximo total, como SearchPool.iterar."""
+    limite = time.monotonic() + timeout
+    async with aclosing(generador):
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                elemento = await asyncio.wait_for(anext(generador), restante)
+            except StopAsyncIteration:
+                return
+            yield elemento
+
+
+async def buscar_candidatos(palabra_clave, cantidad=SEARCH_NUMBER, videoService=None, archivados=None):
+    """
+    Generador asíncrono que produce, página a página, tuplas (proveedor,
+    candidatos) con los candidatos nuevos (deduplicados) de la primera
+    estrategia que devuelva resultados.
+    Las estrategias bloqueantes se ejecutan en el pool de búsqueda; las
+    asíncronas (Invidious) directamente en el event loop con el mismo timeout.
+
+    Si se pasa archivados (IDs de un archivo anterior), se busca por fecha de
+    subida y se deja de paginar en la primera página que contenga un vídeo ya
+    archivado: lo que viene detrás es más antiguo y ya se conoce.
+
+    Si se pasa videoService (búsquedas recurrentes), se descartan los IDs que
+    ya están en la base de datos y se deja de paginar en cuanto todos los
+    candidatos publicables de una página (los que no superan LIMIT_VIEWS) son
+    conocidos: los resultados siguientes ya se procesaron antes. Los que
+    superan el límite no cuentan porque nunca llegan a insertarse.
+
+    Si ninguna estrategia devuelve resultados y alguna falló, lanza
+    RuntimeError para que la tarea se reintente más tarde.
+    """
+    pool = get_search_pool()
+    limiter = get_rate_limiter()
+    loop = asyncio.get_running_loop()
+    vistos = set()
+    errores = []
+
+    for proveedor, estrategia in ESTRATEGIAS:
+        # Un token por petición al proveedor, no por búsqueda. Las estrategias
+        # bloqueantes lo piden desde su hilo al limitador, que vive en el loop.
+        async def presupuesto_async(proveedor=proveedor):
+            await limiter.consumir(proveedor, timeout=pool.timeout)
+
+        def presupuesto_hilo(cancelado=None, proveedor=proveedor):
+            # El hilo del pool espera poco y a ratos cortos, para no dejar sin
+            # hilos al resto de búsquedas ni ignorar una cancelación
+            future = asyncio.run_coroutine_threadsafe(
+                limiter.consumir(proveedor, timeout=SEARCH_RATE_THREAD_WAIT), loop
+            )
+            while True:
+                try:
+                    return future.result(timeout=0.25)
+                except concurrent.futures.TimeoutError:
+                    if cancelado is not None and cancelado.is_set():
+                        future.cancel()
+                        raise PresupuestoAgotado(proveedor)
+
+        encontrados = 0
+        resultado = None
+        inicio = time.perf_counter()
+        try:
+            try:
+                recientes = archivados is not None
+                if inspect.isasyncgenfunction(estrategia):
+                    iterador = _con_timeout(
+                        estrategia(palabra_clave, cantidad, recientes, presupuesto_async), pool.timeout
+                    )
+                else:
+                    iterador = pool.iterar(
+                        estrategia, palabra_clave, cantidad, recientes, presupuesto_hilo
+                    )
+                async with aclosing(iterador) as paginas:
+                    async for pagina in paginas:
+                        encontrados += len(pagina)
+                        nuevos = []
+                        alcanzado_archivo = False
+                        for candidato in pagina:
+                            if recientes and candidato["video_id"] in archivados:
+                                alcanzado_archivo = True
+                                continue
+                            if candidato["video_id"] not in vistos:
+                                vistos.add(candidato["video_id"])
+                                nuevos.append(candidato)
+
+                        if alcanzado_archivo:
+                            if nuevos:
+                                yield proveedor, nuevos
+                            print(f"⏹️ Alcanzados resultados archivados para '{palabra_clave}', fin de la búsqueda")
+                            return
+
+                        publicables = [c for c in nuevos if dentro_del_limite(c)]
+                        if videoService and publicables:
+                            conocidos = await videoService.get_existing_ids(
+                                [c["video_id"] for c in publicables]
                             )
-                    page += 1
-                    if page > 10:
-                        more_results = False
+                            if len(conocidos) == len(publicables):
+                                print(f"⏹️ Página ya conocida para '{palabra_clave}', fin de la búsqueda")
+                                return
+                            nuevos = [c for c in nuevos if c["video_id"] not in conocidos]
+
+                        if nuevos:
+                            yield proveedor, nuevos
+            except PresupuestoAgotado:
+                # Con páginas ya entregadas la búsqueda termina aquí sin error
+                resultado = "rate_limited"
+                if encontrados:
+                    print(f"🚦 Presupuesto de {proveedor} agotado, fin de la búsqueda")
                 else:
-                    raise Exception("Status error")
-            return links
-        except:
-            continue
-    raise Exception("Fallo total en Invidious")
+                    print(f"🚦 Sin presupuesto para {proveedor}, se prueba la siguiente estrategia")
+                    errores.append(f"{proveedor}: rate limited")
+            except asyncio.TimeoutError:
+                resultado = "timeout"
+                print(f"⏱️ {estrategia.__name__} superó el tiempo máximo para '{palabra_clave}'")
+                errores.append(f"{proveedor}: timeout")
+            except Exception as e:
+                resultado = "error"
+                errores.append(f"{proveedor}: {e}")
+        finally:
+            # También al salir antes de tiempo (página conocida o archivo alcanzado)
+            SCRAPER_PROVIDER_DURATION.observe(time.perf_counter() - inicio, provider=proveedor)
+            SCRAPER_PROVIDER_OUTCOMES.inc(
+                provider=proveedor, outcome=resultado or ("ok" if encontrados else "empty")
+            )
+        if encontrados:
+            return
+
+    if errores:
+        raise RuntimeError("; ".join(errores))
+
+
+# --- 4. ENVÍO AL SERVIDOR ---
 
+def _contar(progreso, etapa, cantidad=1):
+    """Suma a la métrica de ingesta del proceso y, si hay, al progreso de la tarea."""
+    if cantidad:
+        INGEST_VIDEOS.inc(cantidad, stage=etapa)
+    if progreso:
+        progreso.add(etapa, cantidad)
 
-# --- 3. ENVÍO AL SERVIDOR ---
 
-async def enviar_ids_al_servidor(lista_urls, videoService):
+def _medir(progreso, etapa, segundos):
+    INGEST_STAGE_DURATION.observe(segundos, stage=etapa)
+    if progreso:
+        progreso.timing(etapa, segundos)
+
+
+async def enviar_ids_al_servidor(candidatos, videoService, progreso=None, concurrencia=INGEST_PUBLISH_CONCURRENCY):
+    """
+    Publica los candidatos según llegan de la cola hasta recibir None.
+    Varias publicaciones van en paralelo para que las consultas de metadatos
+    se agrupen en lotes (ver MetadataBatcher); cada publicador se registra en
+    el buffer de inserción para que el lote se escriba en cuanto todos están
+    esperando, sin esperar al temporizador (ver VideoInsertBuffer).
+    """
     from models.controller.input.publish_video_request import PublishVideoRequest
-    
-    patron_regex = r"(?:v=|\/)([0-9A-Za-z_-]{11})"
-    print(f"🚀 Enviando {len(lista_urls)} IDs al servidor...")
 
     enviados = 0
+    intentos = 0
+    buffer = get_video_insert_buffer()
 
-    for url_video in lista_urls:
-        match = re.search(patron_regex, url_video)
-        if match:
-            video_id = match.group(1)
-            request = PublishVideoRequest(video_id=video_id)
+    async def publicador():
+        buffer.registrar()
+        try:
+            await publicar()
+        finally:
+            buffer.liberar()
+
+    async def publicar():
+        nonlocal enviados, intentos
+        while True:
+            with buffer.sin_trabajo():
+                candidato = await candidatos.get()
+            if candidato is None:
+                # Se deja el marcador para que también terminen los demás publicadores
+                candidatos.put_nowait(None)
+                return
+            video_id = candidato["video_id"]
+            intentos += 1
+            try:
+                request = PublishVideoRequest(video_id=video_id)
+            except Exception:
+                print(f"   ❓ ID no válido: {video_id}")
+                continue
 
+            _contar(progreso, "scraped")
             try:
-                await videoService.publish_video(request)
+                await videoService.publish_video(request, buffered=True)
                 enviados += 1
+                _contar(progreso, "inserted")
                 print(f"Insertado video con ID: {video_id}")
             except Exception as e:
+                _contar(progreso, "rejected")
                 print(f"   ❌ Error ID {video_id}: {e}")
 
             await asyncio.sleep(0.05)
-        else:
-            print(f"   ❓ URL sin ID válido: {url_video}")
 
-    print(f"🏁 Resumen API: {enviados} éxitos de {len(lista_urls)} intentos.")
+    await asyncio.gather(*(publicador() for _ in range(max(1, concurrencia))))
 
+    print(f"🏁 Resumen API: {enviados} éxitos de {intentos} intentos.")
+    return intentos
 
-# --- 4. PROCESO ÚNICO ---
 
-async def buscar_y_procesar(palabra_clave, videoService):
-    """Ejecuta el ciclo completo para UNA palabra clave específica"""
-    nombre_limpio = limpiar_nombre_archivo(palabra_clave)
-    nombre_fichero = f"archives/yt-{nombre_limpio}.json"
-    
-    links_resultantes = []
+# --- 5. PROCESO ÚNICO ---
 
+async def buscar_y_procesar(palabra_clave, videoService, incremental=False, progreso=None):
+    """
+    Ejecuta el ciclo completo para UNA palabra clave específica.
+
+    La búsqueda y la publicación se solapan: cada página de resultados se
+    filtra y se encola para publicar mientras se pide la siguiente.
+    En modo incremental (tareas recurrentes) la búsqueda se detiene al
+    llegar a videos que ya están en la base de datos.
+
+    Los candidatos encontrados se guardan en archives/yt-<palabra>.json.gz.
+    Si ese archivo tiene menos de ARCHIVE_MAX_AGE segundos (y no es una
+    ejecución incremental) se reutiliza sin buscar; si es más antiguo y
+    ARCHIVE_INCREMENTAL está activo, se busca por fecha de subida hasta
+    llegar a los IDs de la búsqueda por fecha anterior ("recientes"). Si el
+    archivo aún no tiene esa marca, la búsqueda por fecha se hace completa
+    para crearla.
+
+    `progreso`, si se indica, recibe los contadores por etapa (add) y la
+    duración de cada una (timing). Los errores de búsqueda se propagan.
+    """
+    nombre_limpio = limpiar_nombre_archivo(palabra_clave)
+    archivo = await cargar_archivo(nombre_limpio)
+    archivados = archivo["candidatos"] if archivo else []
+    recientes_archivados = (archivo.get("recientes") or []) if archivo else []
+
+    cola = asyncio.Queue()
+    inicio = time.monotonic()
+    encontrados = []
+    proveedores = []
+
+    async def paginas_archivadas():
+        print(f"📦 Reutilizando archivo de '{palabra_clave}' ({len(archivados)} candidatos)")
+        conocidos = await videoService.get_existing_ids([c["video_id"] for c in archivados])
+        pendientes = [c for c in archivados if c["video_id"] not in conocidos]
+        if pendientes:
+            yield pendientes
+
+    async def paginas_buscadas():
+        # Solo los IDs de una búsqueda por fecha sirven para cortar otra por
+        # fecha: los de relevancia son videos antiguos que rara vez aparecen
+        # entre las primeras páginas por fecha
+        ids_archivados = None
+        if archivo and ARCHIVE_INCREMENTAL:
+            ids_archivados = set(recientes_archivados)
+        async for proveedor, pagina in buscar_candidatos(
+            palabra_clave,
+            videoService=videoService if incremental else None,
+            archivados=ids_archivados,
+        ):
+            if proveedor not in proveedores:
+                proveedores.append(proveedor)
+            encontrados.extend(pagina)
+            yield pagina
+
+    usar_archivo = bool(archivo) and not incremental and es_reciente(archivo, ARCHIVE_MAX_AGE)
+    paginas = paginas_archivadas() if usar_archivo else paginas_buscadas()
+
+    async def productor():
+        try:
+            async for pagina in paginas:
+                validos = filtrar_por_vistas(pagina)
+                _contar(progreso, "found", len(pagina))
+                _contar(progreso, "filtered", len(pagina) - len(validos))
+                for candidato in validos:
+                    cola.put_nowait(candidato)
+        finally:
+            _medir(progreso, "search", time.monotonic() - inicio)
+            cola.put_nowait(None)
+
+    tarea_busqueda = asyncio.create_task(productor())
     try:
-        links_resultantes = estrategia_ytdlp(palabra_clave, SEARCH_NUMBER)
-    except Exception:
-        pass
+        intentos = await enviar_ids_al_servidor(cola, videoService, progreso)
+    finally:
+        if not tarea_busqueda.done():
+            tarea_busqueda.cancel()
+        _medir(progreso, "total", time.monotonic() - inicio)
+
+    # Propaga el error si todas las estrategias de búsqueda fallaron
+    await tarea_busqueda
+
+    if encontrados:
+        # Los nuevos van delante: el archivo queda ordenado del más reciente al más antiguo
+        ids_nuevos = {c["video_id"] for c in encontrados}
+        candidatos = encontrados + [c for c in archivados if c["video_id"] not in ids_nuevos]
+        recientes = recientes_archivados
+        if archivo and ARCHIVE_INCREMENTAL:
+            # Búsqueda por fecha: sus IDs son la nueva marca
+            recientes = [c["video_id"] for c in encontrados] + [
+                video_id for video_id in recientes_archivados if video_id not in ids_nuevos
+            ]
+        estrategia = ",".join(proveedores)
+        await guardar_archivo(nombre_limpio, palabra_clave, estrategia, candidatos, recientes)
+    elif archivo and not usar_archivo:
+        # Nada nuevo: se renueva la marca de tiempo para no repetir la búsqueda
+        await guardar_archivo(
+            nombre_limpio, palabra_clave, archivo.get("estrategia"), archivados, recientes_archivados
+        )
+
+    if not intentos:
+        print(f"⚠️ Sin videos encontrados para la búsqueda: '{palabra_clave}'")
 
-    if not links_resultantes:
-        try:
-            links_resultantes = estrategia_libreria_python(palabra_clave, SEARCH_NUMBER)
-        except Exception:
-            pass
 
-    if not links_resultantes:
-        try:
-            links_resultantes = estrategia_invidious(palabra_clave, SEARCH_NUMBER)
-        except Exception:
-            pass
+# --- 6. GESTOR DE BUCLE Y LECTURA DE ARCHIVO ---
+
+class EstadisticasIngesta:
+    """Suma los contadores de todas las búsquedas de una ejecución del CLI."""
 
-    links_resultantes = list(dict.fromkeys(links_resultantes))
-    links_resultantes.reverse()
+    def __init__(self, total):
+        self.total = total
+        self.terminadas = 0
+        self.fallidas = 0
+        self.contadores = {}
+        self.inicio = time.monotonic()
 
+    def add(self, contador, cantidad=1):
+        self.contadores[contador] = self.contadores.get(contador, 0) + cantidad
 
-    if links_resultantes:
-        await enviar_ids_al_servidor(links_resultantes, videoService)
+    def timing(self, etapa, segundos):
+        pass
+
+    def resumen(self):
+        transcurrido = max(time.monotonic() - self.inicio, 1e-6)
+        insertados = self.contadores.get("inserted", 0)
+        return (
+            f"📊 {self.terminadas + self.fallidas}/{self.total} búsquedas "
+            f"({self.fallidas} fallidas) | "
+            f"{self.contadores.get('found', 0)} encontrados, "
+            f"{self.contadores.get('filtered', 0)} filtrados, "
+            f"{self.contadores.get('scraped', 0)} scrapeados, "
+            f"{insertados} insertados | "
+            f"{self.terminadas * 60 / transcurrido:.1f} búsquedas/min, "
+            f"{insertados / transcurrido:.2f} inserciones/s"
+        )
+
+
+def leer_palabras(ruta_archivo):
+    """Lee una palabra clave o frase por línea de un archivo, o de stdin con '-'."""
+    if ruta_archivo == "-":
+        lineas = sys.stdin.readlines()
     else:
-        print(f"⚠️ Sin videos encontrados para la búsqueda: '{palabra_clave}'")
+        if not os.path.exists(ruta_archivo):
+            print(f"❌ Error: No se ha encontrado el archivo '{ruta_archivo}'.")
+            print("Crea el archivo y pon una palabra clave o frase por línea.")
+            sys.exit(1)
+        with open(ruta_archivo, "r", encoding="utf-8") as f:
+            lineas = f.readlines()
 
+    # Sin vacías ni repetidas, conservando el orden
+    return list(dict.fromkeys(linea.strip() for linea in lineas if linea.strip()))
 
-# --- 5. GESTOR DE BUCLE Y LECTURA DE ARCHIVO ---
 
-def procesar_lista_palabras(ruta_archivo):
-    """
-    Lee un archivo de texto línea por línea y realiza la búsqueda para cada término.
-    """
-    if not os.path.exists(ruta_archivo):
-        print(f"❌ Error: No se ha encontrado el archivo '{ruta_archivo}'.")
-        print("Crea el archivo y pon una palabra clave o frase por línea.")
-        sys.exit(1)
+def leer_checkpoint(ruta_checkpoint):
+    if not ruta_checkpoint or not os.path.exists(ruta_checkpoint):
+        return set()
+    with open(ruta_checkpoint, "r", encoding="utf-8") as f:
+        return {linea.rstrip("\n") for linea in f if linea.strip()}
 
-    with open(ruta_archivo, "r", encoding="utf-8") as f:
-        lineas = f.readlines()
 
-    palabras_clave = [linea.strip() for linea in lineas if linea.strip()]
+async def procesar_lista_palabras(
+    palabras_clave, videoService, concurrencia=4, ruta_checkpoint=None, intervalo_resumen=30
+):
+    """
+    Busca y publica cada término con `concurrencia` búsquedas simultáneas.
 
-    if not palabras_clave:
-        print(f"⚠️ El archivo '{ruta_archivo}' está vacío.")
-        sys.exit(1)
+    Cada término terminado se añade a `ruta_checkpoint`, de modo que al
+    relanzar con el mismo checkpoint se continúa donde se dejó. Los términos
+    que fallan no se apuntan y se reintentan en la siguiente ejecución.
+    """
+    completadas = leer_checkpoint(ruta_checkpoint)
+    pendientes = [p for p in palabras_clave if p not in completadas]
 
-    print(f"\n📢 --- INICIANDO PROCESO DESDE ARCHIVO ---")
-    print(f"📄 Archivo: {ruta_archivo}")
-    print(f"🔍 Palabras a procesar: {len(palabras_clave)}")
+    print(f"\n📢 --- INICIANDO INGESTA MASIVA ---")
+    print(f"🔍 Palabras a procesar: {len(pendientes)} (ya completadas: {len(palabras_clave) - len(pendientes)})")
+    print(f"⚙️ Concurrencia: {concurrencia}")
     print("--------------------------------------------------\n")
 
-    for palabra in palabras_clave:
-        print(f"\n📆 >>> Procesando búsqueda: '{palabra}'")
-        buscar_y_procesar(palabra)
-        print("⏳ Esperando 2 segundos antes de la siguiente búsqueda...")
-        time.sleep(2)
+    estadisticas = EstadisticasIngesta(len(pendientes))
+    cola = asyncio.Queue()
+    for palabra in pendientes:
+        cola.put_nowait(palabra)
+
+    checkpoint = open(ruta_checkpoint, "a", encoding="utf-8") if ruta_checkpoint else None
 
+    async def trabajador():
+        while True:
+            try:
+                palabra = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            print(f"\n📆 >>> Procesando búsqueda: '{palabra}'")
+            try:
+                await buscar_y_procesar(palabra, videoService, progreso=estadisticas)
+            except Exception as e:
+                estadisticas.fallidas += 1
+                print(f"❌ Error en la búsqueda '{palabra}': {e}")
+                continue
+            estadisticas.terminadas += 1
+            if checkpoint:
+                checkpoint.write(palabra + "\n")
+                checkpoint.flush()
+
+    async def informar():
+        while True:
+            await asyncio.sleep(intervalo_resumen)
+            print(estadisticas.resumen())
+
+    tarea_resumen = asyncio.create_task(informar())
+    try:
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    finally:
+        tarea_resumen.cancel()
+        if checkpoint:
+            checkpoint.close()
+
+    print(estadisticas.resumen())
     print("\n✅ Proceso completado. Se han leído todas las líneas del archivo.")
+    return estadisticas
 
 
+async def _main_cli(args):
+    from common.ioc import get_video_service
+
+    palabras_clave = leer_palabras(args.archivo)
+    if not palabras_clave:
+        print(f"⚠️ El archivo '{args.archivo}' está vacío.")
+        sys.exit(1)
+
+    ruta_checkpoint = args.checkpoint
+    if ruta_checkpoint is None and args.archivo != "-":
+        ruta_checkpoint = f"{args.archivo}.checkpoint"
+
+    try:
+        await procesar_lista_palabras(
+            palabras_clave,
+            get_video_service(),
+            concurrencia=args.concurrencia,
+            ruta_checkpoint=ruta_checkpoint,
+            intervalo_resumen=args.resumen,
+        )
+    finally:
+        await get_video_insert_buffer().flush()
+        get_search_pool().cerrar()
+        await get_invidious_client().cerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Ingesta masiva: busca y publica los videos de cada palabra clave de un archivo."
+    )
+    parser.add_argument(
+        "archivo",
+        nargs="?",
+        default="-",
+        help="Archivo con una palabra clave o frase por línea ('-' o vacío para stdin)",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrencia",
+        type=int,
+        default=4,
+        help="Búsquedas simultáneas (las búsquedas en sí están limitadas por SEARCH_POOL_WORKERS)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Archivo de progreso para reanudar (por defecto <archivo>.checkpoint)",
+    )
+    parser.add_argument(
+        "--resumen",
+        type=int,
+        default=30,
+        help="Segundos entre resúmenes de rendimiento",
+    )
+    asyncio.run(_main_cli(parser.parse_args()))
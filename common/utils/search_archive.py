@@ -0,0 +1,73 @@
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from common.config import ARCHIVE_DIR, ARCHIVE_MAX_CANDIDATES, ARCHIVE_RECENT_IDS
+
+
+def ruta_archivo(nombre_limpio):
+    return os.path.join(ARCHIVE_DIR, f"yt-{nombre_limpio}.json.gz")
+
+
+def _leer(ruta):
+    try:
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir(ruta, datos):
+    directorio = os.path.dirname(ruta) or "."
+    os.makedirs(directorio, exist_ok=True)
+    # Temporal con nombre único: dos búsquedas que comparten archivo
+    # ("Foo!" y "foo") no escriben a la vez en el mismo temporal
+    with tempfile.NamedTemporaryFile(
+        dir=directorio, prefix=os.path.basename(ruta), suffix=".tmp", delete=False
+    ) as temporal:
+        try:
+            with gzip.open(temporal, "wt", encoding="utf-8") as f:
+                json.dump(datos, f, ensure_ascii=False)
+        except BaseException:
+            os.remove(temporal.name)
+            raise
+    # Reemplazo atómico: un lector nunca ve un archivo a medio escribir
+    os.replace(temporal.name, ruta)
+
+
+async def cargar_archivo(nombre_limpio):
+    """
+    Devuelve el resultado archivado de una búsqueda o None si no existe:
+    {"palabra", "estrategia", "timestamp", "candidatos": [...], "recientes": [...]}.
+
+    "recientes" son los IDs más nuevos de la última búsqueda por fecha de
+    subida (del más reciente al más antiguo): la búsqueda incremental para
+    en cuanto vuelve a verlos. Los archivos antiguos no lo tienen.
+    """
+    ruta = ruta_archivo(nombre_limpio)
+    if not os.path.exists(ruta):
+        return None
+    return await asyncio.to_thread(_leer, ruta)
+
+
+async def guardar_archivo(nombre_limpio, palabra_clave, estrategia, candidatos, recientes=None):
+    # Los candidatos llegan del más reciente al más antiguo: se recorta por el final
+    datos = {
+        "palabra": palabra_clave,
+        "estrategia": estrategia,
+        "timestamp": datetime.utcnow().isoformat(),
+        "candidatos": candidatos[:ARCHIVE_MAX_CANDIDATES],
+        "recientes": (recientes or [])[:ARCHIVE_RECENT_IDS],
+    }
+    await asyncio.to_thread(_escribir, ruta_archivo(nombre_limpio), datos)
+
+
+def es_reciente(archivo, max_age_seconds):
+    try:
+        timestamp = datetime.fromisoformat(archivo["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return datetime.utcnow() - timestamp < timedelta(seconds=max_age_seconds)
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SearchPool:
+    """
+    Pool de hilos dedicado a las estrategias de búsqueda, que son bloqueantes
+    (yt-dlp, requests, time.sleep) y no deben ejecutarse en el event loop.
+
+    Cada llamada recibe un threading.Event `cancelado` que se activa al vencer
+    el timeout o al cancelarse la corrutina; las estrategias lo consultan entre
+    páginas para abandonar la búsqueda cuanto antes.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="search"
+        )
+        self._lock = threading.Lock()
+        self._en_cola = 0
+        self._en_curso = 0
+
+    async def iterar(self, generador, *args, timeout: float = None):
+        """
+        Ejecuta un generador bloqueante en el pool y reenvía cada elemento que
+        produce al event loop según llega. El timeout limita la duración total
+        de la iteración; cerrar el generador asíncrono cancela la búsqueda.
+        """
+        loop = asyncio.get_running_loop()
+        cola: asyncio.Queue = asyncio.Queue()
+        cancelado = threading.Event()
+        fin = object()
+
+        def entregar(elemento, error=None):
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, (elemento, error))
+            except RuntimeError:
+                # El loop ya se cerró
+                cancelado.set()
+
+        def tarea():
+            with self._lock:
+                self._en_cola -= 1
+                self._en_curso += 1
+            try:
+                for elemento in generador(*args, cancelado=cancelado):
+                    if cancelado.is_set():
+                        break
+                    entregar(elemento)
+                entregar(fin)
+            except BaseException as e:
+                entregar(fin, e)
+            finally:
+                with self._lock:
+                    self._en_curso -= 1
+
+        with self._lock:
+            self._en_cola += 1
+        future = self._executor.submit(tarea)
+        limite = loop.time() + (timeout or self.timeout)
+
+        try:
+            while True:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    raise asyncio.TimeoutError()
+                elemento, error = await asyncio.wait_for(cola.get(), restante)
+                if elemento is fin:
+                    if error:
+                        raise error
+                    return
+                yield elemento
+        finally:
+            cancelado.set()
+            if future.cancel():
+                with self._lock:
+                    self._en_cola -= 1
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._en_curso,
+                "queued": self._en_cola,
+            }
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
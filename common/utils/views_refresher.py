@@ -0,0 +1,115 @@
+"""
+Refresco en segundo plano de las vistas de los videos publicados.
+
+Recorre la colección empezando por los videos revisados hace más tiempo (los
+que nunca se revisaron van primero), pide las estadísticas por lotes a los
+proveedores compatibles con la Data API y aplica los cambios con un único
+bulk_write desordenado por lote. Los videos que superan LIMIT_VIEWS se
+marcan y, si lo siguen superando en la revisión siguiente, se eliminan. Los
+que llegan sin recuento de vistas conservan el guardado.
+
+El progreso vive en la propia colección (views_checked_at), así que tras un
+reinicio se continúa por donde se dejó.
+
+Uso independiente:
+    python -m common.utils.views_refresher [--once]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from common.utils.scriptscrapper import obtener_datos_youtube_lote
+
+
+class ViewsRefresher:
+
+    def __init__(self, videoService, batch_size: int, pause: float, max_age: int, idle: int):
+        self._videoService = videoService
+        self.batch_size = batch_size
+        self.pause = pause
+        self.max_age = max_age
+        self.idle = idle
+        self._inicio = None
+        self._totales = {"batches": 0, "checked": 0, "updated": 0, "evicted": 0, "missing": 0, "errors": 0}
+        self._ultimo_lote = None
+
+    async def refresh_batch(self) -> int:
+        """Procesa un lote y devuelve cuántos videos se revisaron (0 si no quedan)."""
+        inicio = time.monotonic()
+        checked_before = datetime.utcnow() - timedelta(seconds=self.max_age)
+        video_ids = await self._videoService.get_videos_to_refresh(checked_before, self.batch_size)
+        if not video_ids:
+            return 0
+
+        datos = await asyncio.to_thread(obtener_datos_youtube_lote, video_ids)
+        if not datos:
+            # Ningún resultado suele ser caída del proveedor, no videos borrados:
+            # no se marcan como revisados para volver a intentarlo
+            raise RuntimeError("Los proveedores no devolvieron ningún video")
+        views = {video_id: d["views"] for video_id, d in datos.items() if d.get("views") is not None}
+        missing = [video_id for video_id in video_ids if video_id not in views]
+        resultado = await self._videoService.refresh_views(views, missing)
+
+        duracion = time.monotonic() - inicio
+        self._totales["batches"] += 1
+        self._totales["checked"] += len(video_ids)
+        self._totales["updated"] += len(views) - resultado["evicted"]
+        self._totales["evicted"] += resultado["evicted"]
+        self._totales["missing"] += len(missing)
+        self._ultimo_lote = {
+            "size": len(video_ids),
+            "seconds": round(duracion, 3),
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        return len(video_ids)
+
+    async def run(self, once: bool = False):
+        self._inicio = time.monotonic()
+        while True:
+            try:
+                revisados = await self.refresh_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._totales["errors"] += 1
+                print(f"[views-refresh] Error refreshing batch: {e}")
+                revisados = None
+
+            if revisados == 0:
+                if once:
+                    return
+                await asyncio.sleep(self.idle)
+            else:
+                # Pausa entre lotes para no competir con la API ni agotar los proveedores
+                await asyncio.sleep(self.pause)
+
+    def estado(self) -> dict:
+        transcurrido = time.monotonic() - self._inicio if self._inicio else 0
+        return {
+            **self._totales,
+            "videos_per_second": round(self._totales["checked"] / transcurrido, 3) if transcurrido else 0,
+            "last_batch": self._ultimo_lote,
+        }
+
+
+async def main(once: bool):
+    from common.ioc import get_video_repository, get_views_refresher
+
+    await get_video_repository().ensure_indexes()
+    refresher = get_views_refresher()
+    try:
+        await refresher.run(once=once)
+    finally:
+        print(f"Views refresh stopped: {refresher.estado()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresco de vistas de los videos publicados")
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Termina cuando no quedan videos pendientes de revisar en vez de esperar",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.once))
@@ -1,5 +1,9 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from common.config import DATABASE_URL
+from common.config import DATABASE_URL, MONGO_SLOW_MS, MONGO_SLOW_SHAPES, MONGO_EXPLAIN_SLOW
+from db.command_monitor import MongoCommandMonitor
 
-db_client = AsyncIOMotorClient(DATABASE_URL).get_database("randomyt_db")
-db_tasks = AsyncIOMotorClient(DATABASE_URL).get_database("randomyt_cola")
+# Mide y atribuye cada comando; registra las consultas lentas y su plan
+command_monitor = MongoCommandMonitor(DATABASE_URL, MONGO_SLOW_MS, MONGO_SLOW_SHAPES, MONGO_EXPLAIN_SLOW)
+
+db_client = AsyncIOMotorClient(DATABASE_URL, event_listeners=[command_monitor]).get_database("randomyt_db")
+db_tasks = AsyncIOMotorClient(DATABASE_URL, event_listeners=[command_monitor]).get_database("randomyt_cola")
@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from pymongo import MongoClient, monitoring
+
+from common.metrics import CURRENT_OPERATION, MONGO_COMMAND_DURATION, MONGO_SLOW_COMMANDS
+
+# Comandos de los que se captura el plan la primera vez que una forma es lenta
+EXPLICABLES = {"find": ("filter", "sort"), "aggregate": ("pipeline",), "count": ("query",)}
+
+# Sin contabilizar como lentos: los getMore de change streams (TaskNotifier)
+# esperan por diseño el awaitData del servidor (~1 s) y su "colección" es el
+# id del cursor, así que cada reconexión crearía otra forma
+SIN_LENTAS = ("getMore",)
+
+# Campos de sesión/transacción que no se pueden reenviar dentro de explain
+_CAMPOS_SESION = ("lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern")
+
+
+def forma(valor):
+    """
+    Sustituye los valores por "?" conservando claves y operadores ($regex,
+    $nin, $sample...), de modo que consultas que solo cambian en los valores
+    comparten forma. Las listas de escalares ($in, $nin) colapsan a ["?"].
+    """
+    if isinstance(valor, dict):
+        return {clave: forma(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        if all(not isinstance(v, (dict, list, tuple)) for v in valor):
+            return ["?"]
+        return [forma(v) for v in valor]
+    return "?"
+
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """
+    Listener de comandos de pymongo registrado en los clientes de db/client.py.
+
+    - Mide cada comando en MONGO_COMMAND_DURATION atribuyéndolo al método de
+      repositorio en curso (CURRENT_OPERATION, ver instrument_repository).
+    - Los que superan `slow_ms` se escriben en el log y se agregan por forma
+      de consulta (comando, colección y filtro sin valores).
+    - La primera vez que una forma de find/aggregate/count es lenta se pide su
+      explain (queryPlanner, no ejecuta la consulta) en un hilo aparte con un
+      cliente sin listeners, para ver si hace COLLSCAN.
+
+    Los listeners se llaman de forma síncrona en el hilo que envía el
+    comando, así que aquí solo se hace trabajo en memoria.
+    """
+
+    def __init__(self, url: str, slow_ms: float, max_shapes: int, explain: bool = True):
+        self._url = url
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._en_curso: Dict[tuple, tuple] = {}
+        self._formas: Dict[str, dict] = {}
+        self._cliente_explain: Optional[MongoClient] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def started(self, event):
+        with self._lock:
+            self._en_curso[(event.connection_id, event.request_id)] = (
+                CURRENT_OPERATION.get() or "other",
+                event.database_name,
+                event.command,
+            )
+
+    def succeeded(self, event):
+        self._terminar(event)
+
+    def failed(self, event):
+        self._terminar(event)
+
+    def _terminar(self, event):
+        with self._lock:
+            datos = self._en_curso.pop((event.connection_id, event.request_id), None)
+        if datos is None:
+            return
+        operacion, base, comando = datos
+        segundos = event.duration_micros / 1_000_000
+        MONGO_COMMAND_DURATION.observe(segundos, command=event.command_name, operation=operacion)
+        if segundos * 1000 >= self.slow_ms and event.command_name not in SIN_LENTAS:
+            MONGO_SLOW_COMMANDS.inc(command=event.command_name, operation=operacion)
+            self._registrar_lenta(event.command_name, operacion, base, comando, segundos * 1000)
+
+    def _registrar_lenta(self, nombre: str, operacion: str, base: str, comando, ms: float):
+        coleccion = comando.get(nombre)
+        cuerpo = {campo: forma(comando[campo]) for campo in EXPLICABLES.get(nombre, ()) if campo in comando}
+        clave = f"{nombre} {base}.{coleccion} {json.dumps(cuerpo, sort_keys=True, default=str)}"
+        print(f"Slow Mongo command ({ms:.0f} ms) from {operacion}: {clave}")
+
+        with self._lock:
+            entrada = self._formas.get(clave)
+            nueva = entrada is None
+            if nueva:
+                if len(self._formas) >= self.max_shapes:
+                    # Se descarta la forma que menos tiempo ha acumulado
+                    menor = min(self._formas, key=lambda k: self._formas[k]["total_ms"])
+                    del self._formas[menor]
+                entrada = self._formas[clave] = {
+                    "shape": clave,
+                    "command": nombre,
+                    "namespace": f"{base}.{coleccion}",
+                    "operations": [],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_seen": None,
+                    "collscan": None,
+                    "explain": None,
+                }
+            entrada["count"] += 1
+            entrada["total_ms"] += ms
+            entrada["max_ms"] = max(entrada["max_ms"], ms)
+            entrada["last_seen"] = time.time()
+            if operacion not in entrada["operations"]:
+                entrada["operations"].append(operacion)
+
+        if nueva and self.explain and nombre in EXPLICABLES:
+            self._ejecutor().submit(self._explicar, clave, base, comando)
+
+    def _ejecutor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mongo-explain")
+            return self._executor
+
+    def _explicar(self, clave: str, base: str, comando):
+        cuerpo = {
+            campo: valor
+            for campo, valor in comando.items()
+            if not campo.startswith("$") and campo not in _CAMPOS_SESION
+        }
+        try:
+            if self._cliente_explain is None:
+                self._cliente_explain = MongoClient(self._url, maxPoolSize=1, serverSelectionTimeoutMS=5000)
+            resultado = self._cliente_explain[base].command("explain", cuerpo, verbosity="queryPlanner")
+            plan = {
+                campo: resultado[campo] for campo in ("queryPlanner", "stages") if campo in resultado
+            }
+            collscan = '"COLLSCAN"' in json.dumps(plan, default=str)
+        except Exception as e:
+            plan, collscan = {"error": str(e)}, None
+        with self._lock:
+            entrada = self._formas.get(clave)
+            if entrada is not None:
+                entrada["explain"] = json.loads(json.dumps(plan, default=str))
+                entrada["collscan"] = collscan
+
+    def top(self, limit: int = 20) -> List[dict]:
+        """Formas lentas ordenadas por tiempo total acumulado."""
+        with self._lock:
+            entradas = [
+                {**entrada, "operations": list(entrada["operations"])} for entrada in self._formas.values()
+            ]
+        entradas.sort(key=lambda e: e["total_ms"], reverse=True)
+        for entrada in entradas:
+            entrada["avg_ms"] = entrada["total_ms"] / entrada["count"]
+        return entradas[:limit]
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._cliente_explain is not None:
+            self._cliente_explain.close()
@@ -1,20 +1,33 @@
-from fastapi import Depends, FastAPI, HTTPException, Query, Request
-from common.ioc import get_video_service, get_task_service
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from common.ioc import get_video_service, get_task_service, get_search_pool, get_task_notifier, get_task_repository, get_invidious_client
+from common.ioc import get_video_repository, get_views_refresher, get_video_insert_buffer, get_profile_store
+from common.ioc import get_loop_monitor
 from common.config import DISCORD_YT_RAMDOM, MATRIX_YT_RANDOM_TOKEN, MATRIX_HOMESERVER, MATRIX_USER_ID
+from common.config import TASK_WORKERS, EMBEDDED_TASK_PROCESSOR, TASK_PROGRESS_INTERVAL
+from common.config import VIEWS_REFRESH_ENABLED, ADMIN_TOKEN
+from common.config import PROFILING_ENABLED, PROFILING_SAMPLE_RATE, PROFILING_INTERVAL
+from common.config import LOOP_MONITOR_ENABLED
+from common.utils.profiling import ProfilingMiddleware
+from db.client import command_monitor
 from models.controller.input.array_of_ids import ArrayOfIDsRequest
-from models.controller.input.task_search_request import TaskSearchRequest
+from models.controller.input.task_search_request import TaskSearchRequest, TaskSearchBatchRequest
 from models.controller.output.video_controller import VideoSchema
 from models.domain.video_model import VideoModel
 from models.controller.input.publish_video_request import PublishVideoRequest
 from models.controller.output.page_model import PageModel
 from models.controller.output.meta_model import MetaInfoDTO
+from models.controller.output.task_status_model import TaskStatusDTO
 from service.VideoService import VideoService, IVideoService
 from service.TaskService import ITaskService
+from worker import start_task_workers
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, FileResponse
+from fastapi.responses import RedirectResponse, FileResponse, StreamingResponse, PlainTextResponse
+from common.metrics import REGISTRY, HTTP_REQUEST_DURATION, HTTP_REQUESTS, TASK_QUEUE_DEPTH, SEARCH_POOL_STATE
 from datetime import datetime
 import asyncio
+import hmac
+import time
 
 app = FastAPI(
     title="VideoRandom API",
@@ -28,37 +41,69 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Solo se instala si está habilitado: deshabilitado no cuesta nada por petición
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=get_profile_store(),
+        sample_rate=PROFILING_SAMPLE_RATE,
+        interval=PROFILING_INTERVAL,
+        admin_token=ADMIN_TOKEN,
+    )
 
+_discord_bot = None
 _discord_bot_task = None
-_task_processor_task = None
-_task_event = None
+_task_processor_tasks = []
+_views_refresh_task = None
 
 
-async def process_tasks_loop(
-    taskService: ITaskService, task_event: asyncio.Event, videoService
-):
-    from common.utils.search_and_insert import buscar_y_procesar
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Plantilla de la ruta (/tasks/{task_id}), no la URL, para acotar las etiquetas
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - inicio, method=request.method, route=path
+        )
+        HTTP_REQUESTS.inc(method=request.method, route=path, status=status)
 
-    print("Starting task processor...")
-    while True:
-        await task_event.wait()
-        task_event.clear()
 
-        while True:
-            task = await taskService.get_next_pending_task()
-            if not task:
-                break
+async def collect_queue_metrics():
+    for status, count in (await get_task_service().count_tasks_by_status()).items():
+        TASK_QUEUE_DEPTH.set(count, status=status)
+    estado = get_search_pool().estado()
+    SEARCH_POOL_STATE.set(estado["running"], state="running")
+    SEARCH_POOL_STATE.set(estado["queued"], state="queued")
+
 
-            print(f"Processing task: {task.name}")
-            try:
-                await buscar_y_procesar(task.name, videoService)
-            except Exception as e:
-                print(f"Error processing task {task.name}: {e}")
+REGISTRY.add_collector(collect_queue_metrics)
 
-            await taskService.mark_task_completed(task.id)
-            print(f"Task completed: {task.name}")
 
-        print("No more pending tasks. Waiting for new tasks...")
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Sin ADMIN_TOKEN configurado los endpoints de administración quedan cerrados
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Exposes the process metrics in Prometheus text format.
+
+    Includes per-route latency histograms and status counts, Mongo timings per
+    repository method, search provider latency and outcome, task queue depth,
+    ingest throughput per stage and bot command latency.
+    """
+    return PlainTextResponse(
+        await REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 @app.get("/")
@@ -562,29 +607,224 @@ async def add_task_search(
 
     This endpoint adds a new search term to the task queue.
     The search term will be trimmed and processed by a background job.
-    If a task with the same name already exists, returns a 409 Conflict error.
+    If a task with the same name already exists (ignoring case and extra
+    whitespace), returns a 409 Conflict error.
 
     - **request**: Pydantic model containing the search term.
       - **search_term**: The search term to find videos for (required).
+      - **priority**: Priority from -10 to 10, higher runs first (default: 0).
+      - **recurring_interval**: Seconds between re-runs of the search (optional, min 3600).
+        Recurring runs stop paginating once they reach videos already in the database.
 
     Returns:
-    - The ID of the newly created task.
+    - The search term and the ID of the newly created task.
     """
     trimmed_term = request.search_term.strip()
-    trimmed_term.lower()
     if not trimmed_term:
         raise HTTPException(status_code=400, detail="search_term cannot be empty")
 
-    exists = await taskService.task_exists_by_name(trimmed_term)
-    if exists:
+    task_id, created = await taskService.add_task(
+        trimmed_term, request.priority, request.recurring_interval
+    )
+    if not created:
         raise HTTPException(
             status_code=409, detail="A task with this name already exists"
         )
+    return {"search_term": trimmed_term, "id": task_id}
+
+
+@app.post("/task-search/batch")
+async def add_task_search_batch(
+    request: TaskSearchBatchRequest,
+    taskService: ITaskService = Depends(get_task_service),
+):
+    """
+    Adds many search tasks to the queue in a single database round trip.
+
+    Terms are trimmed and deduplicated ignoring case and extra whitespace,
+    both within the request and against existing tasks. Existing terms are
+    reported instead of failing the whole request.
+
+    - **request**: Pydantic model containing the search terms.
+      - **search_terms**: List of search terms (required, max 1000).
+      - **priority**: Priority from -10 to 10 for all tasks (default: 0).
+      - **recurring_interval**: Seconds between re-runs (optional, min 3600).
+
+    Returns:
+    - The number of created and existing tasks, and the outcome per term.
+    """
+    results = await taskService.add_tasks(
+        request.search_terms, request.priority, request.recurring_interval
+    )
+    created = sum(1 for _, _, was_created in results if was_created)
+    return {
+        "created": created,
+        "existing": len(results) - created,
+        "tasks": [
+            {"search_term": name, "id": task_id, "created": was_created}
+            for name, task_id, was_created in results
+        ],
+    }
+
+
+@app.get("/tasks/{task_id}", response_model=TaskStatusDTO)
+async def get_task_status(
+    task_id: str, taskService: ITaskService = Depends(get_task_service)
+):
+    """
+    Retrieves the status of a search task.
+
+    - **task_id**: ID returned by /task-search (path parameter).
+    - **taskService**: Dependency-injected service for handling task operations.
+
+    Returns:
+    - A TaskStatusDTO with the state, attempts, per-stage counters and timings.
+    """
+    task = await taskService.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return TaskStatusDTO(**task.dict())
+
+
+@app.get("/tasks/{task_id}/events")
+async def stream_task_status(
+    task_id: str,
+    request: Request,
+    taskService: ITaskService = Depends(get_task_service),
+):
+    """
+    Streams the progress of a search task as server-sent events.
+
+    An event with the TaskStatusDTO is sent every time the task changes.
+    The stream ends when the task is done or dead.
+
+    - **task_id**: ID returned by /task-search (path parameter).
+    - **taskService**: Dependency-injected service for handling task operations.
+    """
+    task = await taskService.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def event_stream():
+        last_payload = None
+        while not await request.is_disconnected():
+            task = await taskService.get_task(task_id)
+            if not task:
+                break
+            payload = TaskStatusDTO(**task.dict()).json()
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+            if task.status in ("done", "dead"):
+                break
+            await asyncio.sleep(TASK_PROGRESS_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@app.get("/views-refresh")
+async def get_views_refresh_status():
+    """
+    Returns the throughput of the background view-count refresh.
+
+    Videos are revisited in batches, stalest first; the ones that now exceed the
+    views limit are removed. Enabled with VIEWS_REFRESH_ENABLED.
+
+    Returns:
+    - Whether it is running, batches processed, videos checked, updated, evicted
+      and not returned by the providers, errors, videos per second and last batch.
+    """
+    return {
+        "enabled": VIEWS_REFRESH_ENABLED,
+        "running": bool(_views_refresh_task and not _views_refresh_task.done()),
+        **get_views_refresher().estado(),
+    }
+
 
-    task_id = await taskService.add_task(trimmed_term)
-    if _task_event:
-        _task_event.set()
-    return {"search_term": trimmed_term}
+@app.get("/search-pool")
+async def get_search_pool_status():
+    """
+    Returns the state of the search thread pool.
+
+    The blocking search strategies (yt-dlp, youtube-search-python) run in a
+    dedicated thread pool instead of the event loop; Invidious is queried
+    asynchronously across several instances.
+
+    Returns:
+    - The number of workers, searches running and searches waiting in the queue.
+    - The latency, recent errors and in-flight requests of each Invidious instance.
+    """
+    return {**get_search_pool().estado(), "invidious": get_invidious_client().estado()}
+
+
+@app.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries(limit: int = Query(20, ge=1, le=200)):
+    """
+    Lists the slowest Mongo query shapes seen by this process.
+
+    A shape is the command, namespace and filter/pipeline with the values
+    replaced by "?", so queries that only differ in their values are grouped.
+    Requires the X-Admin-Token header.
+
+    Returns:
+    - The shapes ordered by accumulated time, with count, total, average and max milliseconds.
+    - The repository methods that issued them.
+    - For find/aggregate/count, the query planner output captured the first time
+      the shape was slow and whether it uses a collection scan.
+    """
+    return {"slow_ms": command_monitor.slow_ms, "shapes": command_monitor.top(limit)}
+
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    Lists the stored request profiles, newest first.
+
+    Profiling is enabled with PROFILING_ENABLED. A request is profiled when it
+    carries `X-Profile: 1` with a valid X-Admin-Token, or when it falls in the
+    PROFILING_SAMPLE_RATE sample; its response includes an `X-Profile-Id` header.
+    Requires the X-Admin-Token header.
+
+    Returns:
+    - The id, method, path, status, duration and creation time of each profile.
+    """
+    return {"enabled": PROFILING_ENABLED, "profiles": get_profile_store().listar()}
+
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: str):
+    """
+    Downloads a stored profile as an interactive pyinstrument HTML report.
+
+    Returns:
+    - The HTML report as an attachment.
+    - 404 if the profile does not exist or was already evicted.
+    """
+    path = get_profile_store().ruta(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/html", filename=f"profile-{profile_id}.html")
+
+
+@app.get("/admin/loop-stalls", dependencies=[Depends(require_admin)])
+async def get_loop_stalls():
+    """
+    Returns the event loop lag and the recent stalls.
+
+    A watchdog thread captures the stack of the event loop thread whenever the
+    loop has not run for longer than LOOP_STALL_THRESHOLD seconds, which points
+    at the blocking call. Requires the X-Admin-Token header.
+
+    Returns:
+    - The last and maximum measured lag in seconds.
+    - The recent stalls, newest first, with how long the loop had been blocked and the stack.
+    """
+    monitor = get_loop_monitor()
+    return {**monitor.estado(), "enabled": LOOP_MONITOR_ENABLED, "recent": monitor.bloqueos()}
 
 
 @app.get("/favicon.ico")
@@ -599,39 +839,91 @@ async def get_discord_bot():
     )
 
 
+@app.on_event("startup")
+async def create_indexes():
+    await get_task_repository().ensure_indexes()
+    await get_video_repository().ensure_indexes()
+
+
 @app.on_event("startup")
 async def start_task_processor():
-    global _task_processor_task, _task_event
-    _task_event = asyncio.Event()
+    global _task_processor_tasks
+    if not EMBEDDED_TASK_PROCESSOR:
+        print("Embedded task processor disabled. Run worker.py to process tasks.")
+        return
+
     task_service = get_task_service()
     video_service = get_video_service()
+    task_notifier = get_task_notifier()
+    await task_notifier.start()
 
-    initial_task = await task_service.get_next_pending_task()
-    if initial_task:
-        _task_event.set()
-
-    _task_processor_task = asyncio.create_task(
-        process_tasks_loop(task_service, _task_event, video_service)
+    _task_processor_tasks = start_task_workers(
+        task_service, task_notifier, video_service, TASK_WORKERS
     )
 
 
+@app.on_event("shutdown")
+async def stop_task_processor():
+    for task in _task_processor_tasks:
+        task.cancel()
+    await asyncio.gather(*_task_processor_tasks, return_exceptions=True)
+    await get_task_notifier().stop()
+    # Lo que quede en el buffer de ingesta se escribe antes de cerrar
+    await get_video_insert_buffer().flush()
+
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if LOOP_MONITOR_ENABLED:
+        get_loop_monitor().start()
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await get_loop_monitor().stop()
+
+
+@app.on_event("startup")
+async def start_views_refresh():
+    global _views_refresh_task
+    if not VIEWS_REFRESH_ENABLED:
+        return
+    _views_refresh_task = asyncio.create_task(get_views_refresher().run())
+
+
+@app.on_event("shutdown")
+async def stop_views_refresh():
+    if _views_refresh_task:
+        _views_refresh_task.cancel()
+        await asyncio.gather(_views_refresh_task, return_exceptions=True)
+
+
 @app.on_event("startup")
 async def start_discord_bot():
-    global _discord_bot_task
+    global _discord_bot, _discord_bot_task
     token = DISCORD_YT_RAMDOM
     print(f"Discord token configured: {bool(token)}")
     if token:
         try:
             from bot.discord_bot import DiscordBot
 
-            bot = DiscordBot()
-            _discord_bot_task = asyncio.create_task(bot.start(token))
+            _discord_bot = DiscordBot()
+            _discord_bot_task = asyncio.create_task(_discord_bot.start(token))
         except Exception as e:
             print(f"Failed to start Discord bot: {e}")
     else:
         print("Discord bot token not configured. Bot will not start.")
 
 
+@app.on_event("shutdown")
+async def stop_discord_bot():
+    if _discord_bot:
+        await _discord_bot.stop()
+    if _discord_bot_task:
+        _discord_bot_task.cancel()
+        await asyncio.gather(_discord_bot_task, return_exceptions=True)
+
+
 @app.on_event("startup")
 async def start_matrix_bot():
     token = MATRIX_YT_RANDOM_TOKEN
@@ -648,3 +940,10 @@ async def start_matrix_bot():
             print(f"Failed to start Matrix bot: {e}")
     else:
         print("Matrix bot token not configured. Bot will not start.")
+
+
+@app.on_event("shutdown")
+async def stop_search_pool():
+    get_search_pool().cerrar()
+    await get_invidious_client().cerrar()
+    command_monitor.cerrar()
@@ -1,5 +1,28 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 
 class TaskSearchRequest(BaseModel):
     search_term: str
+    priority: int = Field(
+        default=0, ge=-10, le=10, description="Prioridad de la tarea (mayor se procesa antes)"
+    )
+    recurring_interval: Optional[int] = Field(
+        default=None,
+        ge=3600,
+        description="Si se indica, la búsqueda se repite cada N segundos (mínimo 1 hora)",
+    )
+
+
+class TaskSearchBatchRequest(BaseModel):
+    search_terms: List[str] = Field(
+        ..., min_length=1, max_length=1000, description="Términos de búsqueda (máximo 1000)"
+    )
+    priority: int = Field(
+        default=0, ge=-10, le=10, description="Prioridad de las tareas (mayor se procesa antes)"
+    )
+    recurring_interval: Optional[int] = Field(
+        default=None,
+        ge=3600,
+        description="Si se indica, las búsquedas se repiten cada N segundos (mínimo 1 hora)",
+    )
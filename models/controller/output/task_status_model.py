@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class TaskStatusDTO(BaseModel):
+    id: str = Field(..., description="Task ID")
+    name: str = Field(..., description="Search term")
+    status: str = Field(..., description="pending, running, failed, done or dead")
+    priority: int = Field(0, description="Higher priority runs first")
+    attempts: int = Field(0, description="Number of attempts so far")
+    recurring_interval: Optional[int] = Field(
+        None, description="Seconds between re-runs for recurring searches"
+    )
+    counters: Dict[str, int] = Field(
+        default_factory=dict,
+        description="IDs found, filtered by views, scraped, rejected and inserted in the last run",
+    )
+    timings: Dict[str, float] = Field(
+        default_factory=dict, description="Seconds spent per stage in the last run"
+    )
+    last_error: Optional[str] = Field(None, description="Error of the last failed attempt")
+    date: str = Field(..., description="Date the task was queued")
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    next_run_at: Optional[datetime] = Field(
+        None, description="Next scheduled run (retries and recurring searches)"
+    )
@@ -1,11 +1,32 @@
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime
 
 class TaskDB(BaseModel):
     id: str = Field(alias="_id")
     name: str
     date: str
     completed_at: Optional[str] = None
+    priority: int = 0 # mayor prioridad se procesa antes
+    recurring_interval: Optional[int] = None # segundos entre ejecuciones, None si no es recurrente
+    next_run_at: Optional[datetime] = None # no se reclama antes de esta fecha
+    last_run_at: Optional[datetime] = None
+    claimed_by: Optional[str] = None # worker que tiene la tarea reclamada
+    lease_until: Optional[datetime] = None # si vence, otro worker puede reclamarla
+    status: str = "pending" # pending, running, failed (reintento programado), done, dead
+    attempts: int = 0
+    last_error: Optional[str] = None
+    counters: Dict[str, int] = Field(default_factory=dict) # found, filtered, scraped, rejected, inserted
+    timings: Dict[str, float] = Field(default_factory=dict) # segundos por etapa de la última ejecución
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def legacy_status(self):
+        # Las tareas anteriores a los estados solo tienen completed_at
+        if self.completed_at and self.status == "pending":
+            self.status = "done"
+        return self
 
 
 
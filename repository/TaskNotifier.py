@@ -0,0 +1,141 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+class ITaskNotifier(ABC):
+    @abstractmethod
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    def notify(self):
+        pass
+
+    @abstractmethod
+    async def wait(self, timeout: float) -> bool:
+        pass
+
+
+class TaskNotifier(ITaskNotifier):
+    """
+    Avisa a los workers de que hay tareas nuevas en la colección, se hayan
+    insertado en este proceso o en cualquier otro.
+
+    Usa un change stream de Mongo si el servidor lo soporta (replica set o
+    sharded cluster). Si no, cae a un sondeo de la tarea más reciente con
+    intervalo adaptativo: empieza en min_interval y se duplica hasta
+    max_interval mientras no haya cambios.
+
+    Solo necesita de la colección `watch()` y `find_one()`, por lo que en
+    local se le puede pasar cualquier objeto que los implemente.
+    """
+
+    # Códigos de error de Mongo cuando no hay change streams (servidor standalone)
+    CHANGE_STREAMS_UNSUPPORTED = (40573, 40324)
+
+    def __init__(
+        self,
+        collection,
+        min_interval: float,
+        max_interval: float,
+        use_change_streams: bool = True,
+    ):
+        self._collection = collection
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._use_change_streams = use_change_streams
+        self._event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.mode = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        """Aviso local: la tarea se insertó en este mismo proceso."""
+        self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Espera un aviso; devuelve False si vence el timeout sin avisos."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    async def _run(self):
+        if self._use_change_streams:
+            try:
+                await self._watch_change_stream()
+                return
+            except OperationFailure as e:
+                if e.code not in self.CHANGE_STREAMS_UNSUPPORTED:
+                    raise
+                print("Change streams not supported, falling back to polling for new tasks")
+        await self._poll()
+
+    async def _watch_change_stream(self):
+        self.mode = "change_stream"
+        resume_token = None
+        backoff = self._min_interval
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self._collection.watch(
+                    pipeline, resume_after=resume_token
+                ) as stream:
+                    backoff = self._min_interval
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self._event.set()
+            except OperationFailure as e:
+                if e.code in self.CHANGE_STREAMS_UNSUPPORTED:
+                    raise
+                print(f"Task change stream error: {e}")
+            except PyMongoError as e:
+                print(f"Task change stream error: {e}")
+            # Reconexión con backoff; un aviso por si se perdió algún insert
+            self._event.set()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self._max_interval)
+
+    async def _latest_marker(self):
+        latest = await self._collection.find_one(
+            {}, sort=[("date", -1)], projection={"date": 1}
+        )
+        return (latest or {}).get("date")
+
+    async def _poll(self):
+        self.mode = "polling"
+        interval = self._min_interval
+        try:
+            marker = await self._latest_marker()
+        except PyMongoError:
+            marker = None
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                current = await self._latest_marker()
+                if current != marker:
+                    self._event.set()
+                    marker = current
+                    interval = self._min_interval
+                else:
+                    interval = min(interval * 2, self._max_interval)
+            except PyMongoError as e:
+                print(f"Task polling error: {e}")
+                interval = self._max_interval
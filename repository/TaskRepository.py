@@ -1,14 +1,41 @@
-from typing import Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from db.client import db_tasks
 from models.db.task_db_schema import TaskDB
 from abc import ABC, abstractmethod
 import uuid
+from common.metrics import instrument_repository
+
+
+NORMALIZED_NAME_MIGRATION = "tasks_normalized_name"
+
+
+def normalize_task_name(name: str) -> str:
+    """Clave de deduplicación: sin espacios sobrantes y en minúsculas."""
+    return " ".join(name.split()).lower()
 
 
 class ITaskRepository(ABC):
     @abstractmethod
-    async def insert_task(self, name: str) -> str:
+    async def ensure_indexes(self):
+        pass
+
+    @abstractmethod
+    async def insert_task(
+        self, name: str, priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> Tuple[str, bool]:
+        pass
+
+    @abstractmethod
+    async def insert_tasks_bulk(
+        self, names: List[str], priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> List[Tuple[str, Optional[str], bool]]:
+        pass
+
+    @abstractmethod
+    async def get_task_by_id(self, task_id: str) -> Optional[TaskDB]:
         pass
 
     @abstractmethod
@@ -16,42 +43,368 @@ class ITaskRepository(ABC):
         pass
 
     @abstractmethod
-    async def mark_task_completed(self, task_id: str) -> bool:
+    async def claim_next_task(self, worker_id: str, lease_seconds: int) -> Optional[TaskDB]:
+        pass
+
+    @abstractmethod
+    async def renew_lease(self, task_id: str, worker_id: str, lease_seconds: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def release_task(self, task_id: str, worker_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def mark_task_completed(self, task_id: str, worker_id: Optional[str] = None) -> bool:
+        pass
+
+    @abstractmethod
+    async def reschedule_task(
+        self, task_id: str, interval_seconds: int, worker_id: Optional[str] = None
+    ) -> bool:
+        pass
+
+    @abstractmethod
+    async def mark_task_failed(
+        self, task_id: str, error: str, retry_at: Optional[datetime], worker_id: Optional[str] = None
+    ) -> bool:
+        pass
+
+    @abstractmethod
+    async def update_task_progress(
+        self, task_id: str, counters: Dict[str, int], timings: Dict[str, float],
+        worker_id: Optional[str] = None,
+    ) -> bool:
         pass
 
     @abstractmethod
     async def task_exists_by_name(self, name: str) -> bool:
         pass
 
+    @abstractmethod
+    async def count_tasks_by_status(self) -> Dict[str, int]:
+        pass
+
 
+@instrument_repository
 class TaskRepository(ITaskRepository):
-    async def insert_task(self, name: str) -> str:
-        task_id = str(uuid.uuid4())
-        task_dict = {
-            "_id": task_id,
+    async def ensure_indexes(self):
+        """
+        Crea los índices de la colección de tareas y, una sola vez, rellena
+        normalized_name en las tareas antiguas (ver _backfill_normalized_names).
+        """
+        await db_tasks.tasks.create_index(
+            "normalized_name",
+            unique=True,
+            partialFilterExpression={"normalized_name": {"$type": "string"}},
+        )
+        await db_tasks.tasks.create_index(
+            [("status", ASCENDING), ("priority", DESCENDING), ("date", ASCENDING)]
+        )
+        await db_tasks.tasks.create_index("date")
+
+        if not await db_tasks.migrations.find_one({"_id": NORMALIZED_NAME_MIGRATION}):
+            await self._backfill_normalized_names()
+
+    async def _backfill_normalized_names(self):
+        """
+        Migración: asigna normalized_name a las tareas antiguas con un único
+        bulk_write. Si varias comparten nombre normalizado, la más antigua se
+        lo queda y las demás se marcan con normalized_name None y duplicate_of
+        (fuera del índice único, así que no vuelven a chocar). Al terminar sin
+        colisiones se anota en la colección migrations para no repetirla.
+        """
+        pending = [
+            task
+            async for task in db_tasks.tasks.find(
+                {"normalized_name": {"$exists": False}}, {"name": 1}
+            ).sort("date", ASCENDING)
+        ]
+        owners = {}
+        if pending:
+            normalized = {normalize_task_name(task["name"]) for task in pending}
+            async for task in db_tasks.tasks.find(
+                {"normalized_name": {"$in": list(normalized)}}, {"normalized_name": 1}
+            ):
+                owners[task["normalized_name"]] = task["_id"]
+
+        operations = []
+        for task in pending:
+            name = normalize_task_name(task["name"])
+            owner = owners.setdefault(name, task["_id"])
+            if owner == task["_id"]:
+                update = {"normalized_name": name}
+            else:
+                update = {"normalized_name": None, "duplicate_of": owner}
+            operations.append(UpdateOne({"_id": task["_id"]}, {"$set": update}))
+
+        if operations:
+            try:
+                await db_tasks.tasks.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Otro proceso hizo la migración a la vez: la siguiente
+                # ejecución marcará como duplicadas las que hayan chocado
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+                return
+        await db_tasks.migrations.update_one(
+            {"_id": NORMALIZED_NAME_MIGRATION},
+            {"$set": {"applied_at": datetime.now(timezone.utc), "updated": len(operations)}},
+            upsert=True,
+        )
+
+    def _new_task_document(
+        self, name: str, priority: int, recurring_interval: Optional[int]
+    ) -> dict:
+        return {
+            "_id": str(uuid.uuid4()),
             "name": name,
+            "normalized_name": normalize_task_name(name),
             "date": datetime.now().isoformat(),
             "completed_at": None,
+            "priority": priority,
+            "recurring_interval": recurring_interval,
+            "next_run_at": None,
+            "status": "pending",
+            "attempts": 0,
         }
-        await db_tasks.tasks.insert_one(task_dict)
-        return task_id
+
+    async def insert_task(
+        self, name: str, priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> Tuple[str, bool]:
+        """
+        Inserta la tarea si no existe otra con el mismo nombre normalizado,
+        en una sola operación. Devuelve (id, creada).
+        """
+        task_dict = self._new_task_document(name, priority, recurring_interval)
+        try:
+            existing = await db_tasks.tasks.find_one_and_update(
+                {"normalized_name": task_dict["normalized_name"]},
+                {"$setOnInsert": task_dict},
+                upsert=True,
+                projection={"_id": 1},
+                return_document=ReturnDocument.BEFORE,
+            )
+        except DuplicateKeyError:
+            # Otro proceso la insertó a la vez
+            existing = await db_tasks.tasks.find_one(
+                {"normalized_name": task_dict["normalized_name"]}, {"_id": 1}
+            )
+        if existing:
+            return existing["_id"], False
+        return task_dict["_id"], True
+
+    async def insert_tasks_bulk(
+        self, names: List[str], priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> List[Tuple[str, Optional[str], bool]]:
+        """
+        Inserta muchas tareas con un único bulk_write de upserts.
+        Devuelve (nombre, id, creada) por cada nombre distinto; el id de las
+        que ya existían se obtiene con una sola consulta, como en insert_task.
+        """
+        documents = {}
+        for name in names:
+            task_dict = self._new_task_document(name, priority, recurring_interval)
+            documents.setdefault(task_dict["normalized_name"], task_dict)
+        documents = list(documents.values())
+        if not documents:
+            return []
+
+        operations = [
+            UpdateOne(
+                {"normalized_name": task_dict["normalized_name"]},
+                {"$setOnInsert": task_dict},
+                upsert=True,
+            )
+            for task_dict in documents
+        ]
+        try:
+            result = await db_tasks.tasks.bulk_write(operations, ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as e:
+            # Las colisiones de clave única (inserciones concurrentes) cuentan como existentes
+            upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+
+        existing_ids = {}
+        existing = [task_dict["normalized_name"] for i, task_dict in enumerate(documents) if i not in upserted]
+        if existing:
+            async for task in db_tasks.tasks.find(
+                {"normalized_name": {"$in": existing}}, {"normalized_name": 1}
+            ):
+                existing_ids[task["normalized_name"]] = task["_id"]
+
+        return [
+            (
+                task_dict["name"],
+                upserted[i] if i in upserted else existing_ids.get(task_dict["normalized_name"]),
+                i in upserted,
+            )
+            for i, task_dict in enumerate(documents)
+        ]
+
+    async def get_task_by_id(self, task_id: str) -> Optional[TaskDB]:
+        task_data = await db_tasks.tasks.find_one({"_id": task_id})
+        if task_data:
+            return TaskDB(**task_data)
+        return None
 
     async def get_next_pending_task(self) -> Optional[TaskDB]:
         task_data = await db_tasks.tasks.find_one(
-            {"completed_at": None},
+            {"completed_at": None, "status": {"$nin": ["done", "dead"]}},
             sort=[("date", 1)]
         )
         if task_data:
             return TaskDB(**task_data)
         return None
 
-    async def mark_task_completed(self, task_id: str) -> bool:
+    async def claim_next_task(self, worker_id: str, lease_seconds: int) -> Optional[TaskDB]:
+        """
+        Reclama de forma atómica la tarea pendiente de mayor prioridad (y más
+        antigua dentro de la misma prioridad) que ya toque ejecutar y no tenga
+        un lease vigente (las de workers caídos se recuperan al vencer).
+        """
+        now = datetime.now(timezone.utc)
+        task_data = await db_tasks.tasks.find_one_and_update(
+            {
+                "completed_at": None,
+                "status": {"$nin": ["done", "dead"]},
+                "$and": [
+                    {"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+                    {"$or": [{"next_run_at": None}, {"next_run_at": {"$lte": now}}]},
+                ],
+            },
+            {
+                "$set": {
+                    "claimed_by": worker_id,
+                    "lease_until": now + timedelta(seconds=lease_seconds),
+                    "status": "running",
+                    "started_at": now,
+                    "finished_at": None,
+                    "counters": {},
+                    "timings": {},
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", -1), ("date", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if task_data:
+            return TaskDB(**task_data)
+        return None
+
+    async def renew_lease(self, task_id: str, worker_id: str, lease_seconds: int) -> bool:
+        result = await db_tasks.tasks.update_one(
+            {"_id": task_id, "claimed_by": worker_id, "completed_at": None},
+            {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)}}
+        )
+        return result.matched_count > 0
+
+    async def release_task(self, task_id: str, worker_id: str) -> bool:
+        result = await db_tasks.tasks.update_one(
+            {"_id": task_id, "claimed_by": worker_id},
+            {
+                # Se devuelve a la cola sin contar como intento fallido
+                "$set": {"claimed_by": None, "lease_until": None, "status": "pending"},
+                "$inc": {"attempts": -1},
+            }
+        )
+        return result.modified_count > 0
+
+    @staticmethod
+    def _owned_by(task_id: str, worker_id: Optional[str]) -> dict:
+        """
+        Con worker_id la escritura solo se aplica si la tarea sigue reclamada
+        por ese worker: uno que perdió el lease no pisa al que la reclamó después.
+        """
+        if worker_id is None:
+            return {"_id": task_id}
+        return {"_id": task_id, "claimed_by": worker_id}
+
+    async def mark_task_completed(self, task_id: str, worker_id: Optional[str] = None) -> bool:
         result = await db_tasks.tasks.update_one(
-            {"_id": task_id},
-            {"$set": {"completed_at": datetime.now().isoformat()}}
+            self._owned_by(task_id, worker_id),
+            {
+                "$set": {
+                    "completed_at": datetime.now().isoformat(),
+                    "finished_at": datetime.now(timezone.utc),
+                    "lease_until": None,
+                    "status": "done",
+                }
+            }
         )
         return result.modified_count > 0
 
+    async def reschedule_task(
+        self, task_id: str, interval_seconds: int, worker_id: Optional[str] = None
+    ) -> bool:
+        """Deja una tarea recurrente pendiente de nuevo para dentro de interval_seconds."""
+        now = datetime.now(timezone.utc)
+        result = await db_tasks.tasks.update_one(
+            self._owned_by(task_id, worker_id),
+            {
+                "$set": {
+                    "last_run_at": now,
+                    "next_run_at": now + timedelta(seconds=interval_seconds),
+                    "finished_at": now,
+                    "claimed_by": None,
+                    "lease_until": None,
+                    "status": "pending",
+                    "attempts": 0,
+                }
+            }
+        )
+        return result.modified_count > 0
+
+    async def mark_task_failed(
+        self, task_id: str, error: str, retry_at: Optional[datetime], worker_id: Optional[str] = None
+    ) -> bool:
+        """
+        Con retry_at la tarea queda en "failed" hasta esa fecha y luego se
+        vuelve a reclamar; sin retry_at pasa a "dead" y no se reintenta más.
+        """
+        now = datetime.now(timezone.utc)
+        update = {
+            "last_error": error,
+            "finished_at": now,
+            "claimed_by": None,
+            "lease_until": None,
+        }
+        if retry_at:
+            update.update({"status": "failed", "next_run_at": retry_at})
+        else:
+            update["status"] = "dead"
+        result = await db_tasks.tasks.update_one(self._owned_by(task_id, worker_id), {"$set": update})
+        return result.modified_count > 0
+
+    async def update_task_progress(
+        self, task_id: str, counters: Dict[str, int], timings: Dict[str, float],
+        worker_id: Optional[str] = None,
+    ) -> bool:
+        update = {}
+        if counters:
+            update["$inc"] = {f"counters.{k}": v for k, v in counters.items()}
+        if timings:
+            update["$set"] = {f"timings.{k}": v for k, v in timings.items()}
+        if not update:
+            return False
+        result = await db_tasks.tasks.update_one(self._owned_by(task_id, worker_id), update)
+        return result.modified_count > 0
+
     async def task_exists_by_name(self, name: str) -> bool:
-        count = await db_tasks.tasks.count_documents({"name": name})
-        return count > 0
+        task = await db_tasks.tasks.find_one(
+            {"normalized_name": normalize_task_name(name)}, {"_id": 1}
+        )
+        return task is not None
+
+    async def count_tasks_by_status(self) -> Dict[str, int]:
+        """
+        Tareas por estado. Las anteriores al campo status cuentan como "done"
+        si tienen completed_at y como "pending" si no.
+        """
+        legacy_status = {"$cond": [{"$ifNull": ["$completed_at", False]}, "done", "pending"]}
+        cursor = db_tasks.tasks.aggregate(
+            [{"$group": {"_id": {"$ifNull": ["$status", legacy_status]}, "count": {"$sum": 1}}}]
+        )
+        return {doc["_id"]: doc["count"] async for doc in cursor}
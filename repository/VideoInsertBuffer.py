@@ -0,0 +1,124 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Dict, List
+
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+
+class VideoInsertBuffer:
+    """
+    Buffer de escritura diferida para la ingesta: acumula documentos ya
+    validados y los inserta con un insert_many desordenado cuando hay
+    `max_batch` o han pasado `max_wait` segundos desde el primero.
+
+    Cada llamante recibe el resultado de su documento: True si se insertó,
+    False si ya existía (clave duplicada) o la excepción del resto de errores.
+    Si el llamante se cancela el documento se inserta igualmente.
+
+    Los publicadores de la ingesta se registran con `registrar()`: cuando
+    todos los registrados están esperando (el resultado de su documento, ya
+    esté pendiente o en una escritura en curso, o candidatos en su cola, ver
+    `sin_trabajo()`) el lote ya no va a crecer y se escribe sin esperar a
+    `max_wait`.
+    """
+
+    def __init__(self, collection, max_batch: int, max_wait: float):
+        self._collection = collection
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pendientes: List[tuple] = []
+        self._temporizador = None
+        self._escrituras = set()
+        self._publicadores = 0
+        self._sin_trabajo = 0
+        self._en_escritura = 0
+
+    async def insert(self, document: Dict) -> bool:
+        future = asyncio.get_running_loop().create_future()
+        self._pendientes.append((document, future))
+        if len(self._pendientes) >= self.max_batch or self._todos_esperando():
+            self._vaciar()
+        elif self._temporizador is None:
+            self._temporizador = asyncio.get_running_loop().call_later(
+                self.max_wait, self._vaciar
+            )
+        return await asyncio.shield(future)
+
+    def registrar(self):
+        self._publicadores += 1
+
+    def liberar(self):
+        self._publicadores -= 1
+        self._comprobar()
+
+    @contextmanager
+    def sin_trabajo(self):
+        """Marca a un publicador registrado como parado esperando candidatos."""
+        self._sin_trabajo += 1
+        self._comprobar()
+        try:
+            yield
+        finally:
+            self._sin_trabajo -= 1
+
+    def _todos_esperando(self) -> bool:
+        if self._publicadores <= 0:
+            return False
+        # Los documentos de lotes que se están escribiendo también tienen a
+        # su publicador esperando
+        esperando = len(self._pendientes) + self._en_escritura
+        return esperando + self._sin_trabajo >= self._publicadores
+
+    def _comprobar(self):
+        if self._pendientes and self._todos_esperando():
+            self._vaciar()
+
+    def _vaciar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if not self._pendientes:
+            return
+        lote, self._pendientes = self._pendientes, []
+        self._en_escritura += len(lote)
+        tarea = asyncio.ensure_future(self._escribir(lote))
+        self._escrituras.add(tarea)
+        tarea.add_done_callback(self._escrituras.discard)
+
+    async def _escribir(self, lote: List[tuple]):
+        try:
+            await self._escribir_lote(lote)
+        finally:
+            self._en_escritura -= len(lote)
+
+    async def _escribir_lote(self, lote: List[tuple]):
+        errores = {}
+        try:
+            await self._collection.insert_many([doc for doc, _ in lote], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errores[error["index"]] = error
+        except Exception as e:
+            for _, future in lote:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for index, (_, future) in enumerate(lote):
+            if future.done():
+                continue
+            error = errores.get(index)
+            if error is None:
+                future.set_result(True)
+            elif error.get("code") == DUPLICATE_KEY:
+                future.set_result(False)
+            else:
+                future.set_exception(RuntimeError(error.get("errmsg", "Insert failed")))
+
+    async def flush(self):
+        """Escribe lo pendiente y espera a que terminen las escrituras en curso."""
+        self._vaciar()
+        if self._escrituras:
+            await asyncio.gather(*self._escrituras, return_exceptions=True)
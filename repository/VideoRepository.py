@@ -1,8 +1,12 @@
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from models.db.video_db_schema import VideoDB
 from models.domain.video_model import VideoModel
 from db.client import db_client
 from bson import ObjectId
+from pymongo import ASCENDING, DeleteOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from repository.VideoInsertBuffer import VideoInsertBuffer
+from common.metrics import instrument_repository
 from abc import ABC, abstractmethod
 from datetime import datetime
 
@@ -12,6 +16,10 @@ class IVideoRepository(ABC):
     async def save_video(self, video_model: VideoModel) -> str:
         pass
 
+    @abstractmethod
+    async def save_video_buffered(self, video_model: VideoModel) -> bool:
+        pass
+
     @abstractmethod
     async def get_random_video(self) -> VideoModel:
         pass
@@ -24,6 +32,24 @@ class IVideoRepository(ABC):
     async def get_video_by_id(self, video_id: str) -> VideoModel:
         pass
 
+    @abstractmethod
+    async def get_existing_ids(self, video_ids: List[str]) -> Set[str]:
+        pass
+
+    @abstractmethod
+    async def ensure_indexes(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get_videos_to_refresh(self, checked_before: datetime, limit: int) -> List[str]:
+        pass
+
+    @abstractmethod
+    async def apply_views_refresh(
+        self, views: Dict[str, int], over_limit: Dict[str, int], checked: List[str], checked_at: datetime
+    ) -> Dict[str, int]:
+        pass
+
     @abstractmethod
     async def count_videos(self) -> int:
         pass
@@ -96,17 +122,38 @@ class IVideoRepository(ABC):
         pass
 
 
+@instrument_repository
 class VideoRepository(IVideoRepository):
 
-    async def save_video(self, video_model: VideoModel) -> str:
+    def __init__(self, insert_buffer: Optional[VideoInsertBuffer] = None):
+        self.insert_buffer = insert_buffer
+
+    @staticmethod
+    def _to_document(video_model: VideoModel) -> dict:
         video_dict = video_model.dict()
         if "id" in video_dict:
             video_dict["_id"] = video_dict.pop("id")
 
         video_db = VideoDB(**video_dict)
-        result = await db_client.videos.insert_one(video_db.dict(by_alias=True))
+        return video_db.dict(by_alias=True)
+
+    async def save_video(self, video_model: VideoModel) -> str:
+        result = await db_client.videos.insert_one(self._to_document(video_model))
         return str(result.inserted_id)
 
+    async def save_video_buffered(self, video_model: VideoModel) -> bool:
+        """
+        Inserta el video a través del buffer de escritura diferida (ingesta).
+        Devuelve False si ya existía. Sin buffer configurado equivale a save_video.
+        """
+        if self.insert_buffer is None:
+            try:
+                await self.save_video(video_model)
+            except DuplicateKeyError:
+                return False
+            return True
+        return await self.insert_buffer.insert(self._to_document(video_model))
+
     async def get_random_video(self) -> VideoModel:
         pipeline = [{"$sample": {"size": 1}}]
         result = await db_client.videos.aggregate(pipeline).to_list(length=1)
@@ -147,6 +194,86 @@ class VideoRepository(IVideoRepository):
         else:
             return None
 
+    async def get_existing_ids(self, video_ids: List[str]) -> Set[str]:
+        cursor = db_client.videos.find({"_id": {"$in": video_ids}}, {"_id": 1})
+        return {doc["_id"] async for doc in cursor}
+
+    async def ensure_indexes(self) -> None:
+        # Los videos nunca revisados no tienen views_checked_at y ordenan primero
+        await db_client.videos.create_index(
+            [("views_checked_at", ASCENDING), ("_id", ASCENDING)]
+        )
+
+    async def get_videos_to_refresh(self, checked_before: datetime, limit: int) -> List[str]:
+        """
+        Devuelve los IDs de los videos cuyas vistas llevan más tiempo sin
+        revisarse (primero los que nunca se revisaron), hasta `limit`.
+        """
+        cursor = (
+            db_client.videos.find(
+                {
+                    "$or": [
+                        {"views_checked_at": {"$exists": False}},
+                        {"views_checked_at": {"$lt": checked_before}},
+                    ]
+                },
+                {"_id": 1},
+            )
+            .sort([("views_checked_at", ASCENDING), ("_id", ASCENDING)])
+            .limit(limit)
+        )
+        return [doc["_id"] async for doc in cursor]
+
+    async def apply_views_refresh(
+        self, views: Dict[str, int], over_limit: Dict[str, int], checked: List[str], checked_at: datetime
+    ) -> Dict[str, int]:
+        """
+        Aplica con bulk_write desordenados las vistas nuevas, los videos que
+        superan el límite y la marca de revisión de los que no se pudieron
+        consultar (para que no bloqueen la cola).
+
+        Un video solo se borra si ya superaba el límite en la revisión
+        anterior (views_over_limit); la primera vez solo se marca, porque el
+        dato viene de proveedores de terceros. Los borrados van en un
+        bulk_write previo para que no se confundan con las marcas nuevas.
+        """
+        evicted = 0
+        if over_limit:
+            result = await db_client.videos.bulk_write(
+                [
+                    DeleteOne({"_id": video_id, "views_over_limit": {"$exists": True}})
+                    for video_id in over_limit
+                ],
+                ordered=False,
+            )
+            evicted = result.deleted_count
+
+        operations = [
+            UpdateOne(
+                {"_id": video_id},
+                {
+                    "$set": {"views": count, "views_checked_at": checked_at},
+                    "$unset": {"views_over_limit": ""},
+                },
+            )
+            for video_id, count in views.items()
+        ]
+        operations += [
+            UpdateOne(
+                {"_id": video_id},
+                {"$set": {"views_over_limit": count, "views_checked_at": checked_at}},
+            )
+            for video_id, count in over_limit.items()
+        ]
+        operations += [
+            UpdateOne({"_id": video_id}, {"$set": {"views_checked_at": checked_at}})
+            for video_id in checked
+        ]
+        if not operations:
+            return {"updated": 0, "evicted": evicted}
+        result = await db_client.videos.bulk_write(operations, ordered=False)
+        return {"updated": result.modified_count, "evicted": evicted}
+
     async def count_videos(self) -> int:
         return await db_client.videos.count_documents({})
 
@@ -1,12 +1,27 @@
 from abc import ABC, abstractmethod
 from repository.TaskRepository import ITaskRepository
+from repository.TaskNotifier import ITaskNotifier
 from models.db.task_db_schema import TaskDB
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from common.config import TASK_MAX_ATTEMPTS, TASK_RETRY_BASE_SECONDS
 
 
 class ITaskService(ABC):
     @abstractmethod
-    async def add_task(self, search_term: str) -> str:
+    async def add_task(
+        self, search_term: str, priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> Tuple[str, bool]:
+        pass
+
+    @abstractmethod
+    async def add_tasks(
+        self, search_terms: List[str], priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> List[Tuple[str, Optional[str], bool]]:
+        pass
+
+    @abstractmethod
+    async def get_task(self, task_id: str) -> Optional[TaskDB]:
         pass
 
     @abstractmethod
@@ -14,27 +29,127 @@ class ITaskService(ABC):
         pass
 
     @abstractmethod
-    async def mark_task_completed(self, task_id: str) -> bool:
+    async def claim_next_task(self, worker_id: str, lease_seconds: int) -> Optional[TaskDB]:
+        pass
+
+    @abstractmethod
+    async def renew_lease(self, task_id: str, worker_id: str, lease_seconds: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def release_task(self, task_id: str, worker_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def mark_task_completed(self, task_id: str, worker_id: Optional[str] = None) -> bool:
+        pass
+
+    @abstractmethod
+    async def finish_task(self, task: TaskDB) -> bool:
+        pass
+
+    @abstractmethod
+    async def fail_task(self, task: TaskDB, error: str) -> str:
+        pass
+
+    @abstractmethod
+    async def update_progress(
+        self, task_id: str, counters: Dict[str, int], timings: Dict[str, float],
+        worker_id: Optional[str] = None,
+    ) -> bool:
         pass
 
     @abstractmethod
     async def task_exists_by_name(self, name: str) -> bool:
         pass
 
+    @abstractmethod
+    async def count_tasks_by_status(self) -> Dict[str, int]:
+        pass
+
 
 class TaskService(ITaskService):
-    def __init__(self, task_repository: ITaskRepository):
+    def __init__(self, task_repository: ITaskRepository, task_notifier: Optional[ITaskNotifier] = None):
         self._task_repository = task_repository
+        self._task_notifier = task_notifier
 
-    async def add_task(self, search_term: str) -> str:
+    async def add_task(
+        self, search_term: str, priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> Tuple[str, bool]:
+        """Devuelve (id, creada); si ya existía una tarea equivalente no se duplica."""
         trimmed = search_term.strip()
-        return await self._task_repository.insert_task(trimmed)
+        task_id, created = await self._task_repository.insert_task(
+            trimmed, priority, recurring_interval
+        )
+        if created and self._task_notifier:
+            self._task_notifier.notify()
+        return task_id, created
+
+    async def add_tasks(
+        self, search_terms: List[str], priority: int = 0, recurring_interval: Optional[int] = None
+    ) -> List[Tuple[str, Optional[str], bool]]:
+        trimmed = [term.strip() for term in search_terms if term.strip()]
+        results = await self._task_repository.insert_tasks_bulk(
+            trimmed, priority, recurring_interval
+        )
+        if any(created for _, _, created in results) and self._task_notifier:
+            self._task_notifier.notify()
+        return results
+
+    async def get_task(self, task_id: str) -> Optional[TaskDB]:
+        return await self._task_repository.get_task_by_id(task_id)
 
     async def get_next_pending_task(self) -> Optional[TaskDB]:
         return await self._task_repository.get_next_pending_task()
 
-    async def mark_task_completed(self, task_id: str) -> bool:
-        return await self._task_repository.mark_task_completed(task_id)
+    async def claim_next_task(self, worker_id: str, lease_seconds: int) -> Optional[TaskDB]:
+        return await self._task_repository.claim_next_task(worker_id, lease_seconds)
+
+    async def renew_lease(self, task_id: str, worker_id: str, lease_seconds: int) -> bool:
+        return await self._task_repository.renew_lease(task_id, worker_id, lease_seconds)
+
+    async def release_task(self, task_id: str, worker_id: str) -> bool:
+        return await self._task_repository.release_task(task_id, worker_id)
+
+    async def mark_task_completed(self, task_id: str, worker_id: Optional[str] = None) -> bool:
+        return await self._task_repository.mark_task_completed(task_id, worker_id)
+
+    async def finish_task(self, task: TaskDB) -> bool:
+        """
+        Las tareas recurrentes se reprograman; el resto se marcan como
+        completadas. Solo si siguen reclamadas por el worker que las reclamó
+        (task.claimed_by); devuelve False si otro la ha vuelto a reclamar.
+        """
+        if task.recurring_interval:
+            return await self._task_repository.reschedule_task(
+                task.id, task.recurring_interval, task.claimed_by
+            )
+        return await self._task_repository.mark_task_completed(task.id, task.claimed_by)
+
+    async def fail_task(self, task: TaskDB, error: str) -> str:
+        """
+        Programa un reintento con backoff exponencial (base, 2x base, 4x base...)
+        o, si se agotaron los intentos, manda la tarea a "dead". Devuelve el
+        estado, o "lease_lost" si otro worker la ha vuelto a reclamar.
+        """
+        if task.attempts >= TASK_MAX_ATTEMPTS:
+            retry_at, status = None, "dead"
+        else:
+            delay = TASK_RETRY_BASE_SECONDS * 2 ** max(task.attempts - 1, 0)
+            retry_at, status = datetime.now(timezone.utc) + timedelta(seconds=delay), "failed"
+        if not await self._task_repository.mark_task_failed(task.id, error, retry_at, task.claimed_by):
+            return "lease_lost"
+        return status
+
+    async def update_progress(
+        self, task_id: str, counters: Dict[str, int], timings: Dict[str, float],
+        worker_id: Optional[str] = None,
+    ) -> bool:
+        """Con worker_id solo se escribe si la tarea sigue reclamada por ese worker."""
+        return await self._task_repository.update_task_progress(task_id, counters, timings, worker_id)
 
     async def task_exists_by_name(self, name: str) -> bool:
         return await self._task_repository.task_exists_by_name(name)
+
+    async def count_tasks_by_status(self) -> Dict[str, int]:
+        return await self._task_repository.count_tasks_by_status()
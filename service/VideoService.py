@@ -1,6 +1,7 @@
 from common.config import LIMIT_VIEWS
 from common.utils.genid import gen_id
 from common.utils.scriptscrapper import obtener_datos_youtube
+from common.utils.metadata_batcher import MetadataBatcher
 from models.domain.video_model import VideoModel
 from models.controller.input.publish_video_request import PublishVideoRequest
 from models.controller.output.page_model import PageModel
@@ -8,12 +9,13 @@ from models.controller.output.video_controller import VideoSchema
 from abc import ABC, abstractmethod
 from repository.VideoRepository import VideoRepository
 from datetime import datetime
-from typing import List, Optional
+import asyncio
+from typing import Dict, List, Optional, Set
 
 
 class IVideoService(ABC):
     @abstractmethod
-    async def publish_video(self, request: PublishVideoRequest) -> str:
+    async def publish_video(self, request: PublishVideoRequest, buffered: bool = False) -> str:
         pass
 
     @abstractmethod
@@ -28,6 +30,18 @@ class IVideoService(ABC):
     async def get_video_by_id(self, video_id: str) -> VideoModel:
         pass
 
+    @abstractmethod
+    async def get_existing_ids(self, video_ids: List[str]) -> Set[str]:
+        pass
+
+    @abstractmethod
+    async def get_videos_to_refresh(self, checked_before: datetime, limit: int) -> List[str]:
+        pass
+
+    @abstractmethod
+    async def refresh_views(self, views: Dict[str, int], missing: List[str]) -> Dict[str, int]:
+        pass
+
     @abstractmethod
     async def count_videos(self) -> int:
         pass
@@ -96,18 +110,26 @@ class IVideoService(ABC):
 
 class VideoService(IVideoService):
 
-    def __init__(self, video_repository: VideoRepository):
+    def __init__(self, video_repository: VideoRepository, metadata_batcher: Optional[MetadataBatcher] = None):
         self.video_repository = video_repository
+        self.metadata_batcher = metadata_batcher
 
-    async def publish_video(self, request: PublishVideoRequest) -> str:
+    async def publish_video(self, request: PublishVideoRequest, buffered: bool = False) -> str:
+        """
+        Obtiene los datos del video y lo guarda. Con buffered=True (ingesta) la
+        inserción pasa por el buffer de escritura diferida junto a otras.
+        """
         # Check if video already exists in database
         existing_video = await self.video_repository.get_video_by_id(request.video_id)
         if existing_video:
             raise ValueError("Video is in database")
 
         try:
-            # Scrape data from YouTube
-            datos = obtener_datos_youtube(request.video_id)
+            # Scrape data from YouTube, batched with concurrent publishes when possible
+            if self.metadata_batcher:
+                datos = await self.metadata_batcher.obtener(request.video_id)
+            else:
+                datos = await asyncio.to_thread(obtener_datos_youtube, request.video_id)
         except Exception:
             raise ValueError("Failed to retrieve video information")
 
@@ -128,9 +150,15 @@ class VideoService(IVideoService):
             views=datos["views"],
         )
         try:
-            return await self.video_repository.save_video(video)
+            if buffered:
+                inserted = await self.video_repository.save_video_buffered(video)
+            else:
+                return await self.video_repository.save_video(video)
         except Exception:
             raise ValueError("An error occurred while publishing the video")
+        if not inserted:
+            raise ValueError("Video is in database")
+        return video.id
 
     async def get_random_video(self) -> VideoModel:
         return await self.video_repository.get_random_video()
@@ -141,6 +169,28 @@ class VideoService(IVideoService):
     async def get_video_by_id(self, video_id: str) -> VideoModel:
         return await self.video_repository.get_video_by_id(video_id)
 
+    async def get_existing_ids(self, video_ids: List[str]) -> Set[str]:
+        return await self.video_repository.get_existing_ids(video_ids)
+
+    async def get_videos_to_refresh(self, checked_before: datetime, limit: int) -> List[str]:
+        return await self.video_repository.get_videos_to_refresh(checked_before, limit)
+
+    async def refresh_views(self, views: Dict[str, Optional[int]], missing: List[str]) -> Dict[str, int]:
+        """
+        Guarda las vistas actualizadas y elimina los videos que superan
+        LIMIT_VIEWS en dos revisiones seguidas, igual que se rechazarían al
+        publicarlos. `missing` son los videos que los proveedores no
+        devolvieron, o sin recuento de vistas: solo se marcan como revisados
+        y conservan las vistas guardadas.
+        """
+        missing = list(missing) + [video_id for video_id, count in views.items() if count is None]
+        views = {video_id: count for video_id, count in views.items() if count is not None}
+        over_limit = {video_id: count for video_id, count in views.items() if count > LIMIT_VIEWS}
+        updates = {video_id: count for video_id, count in views.items() if count <= LIMIT_VIEWS}
+        return await self.video_repository.apply_views_refresh(
+            updates, over_limit, missing, datetime.utcnow()
+        )
+
     async def count_videos(self) -> int:
         return await self.video_repository.count_videos()
 
@@ -0,0 +1,119 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+
+from pymongo import ReturnDocument
+
+
+class FakeChangeStream:
+    """Change stream en memoria: entrega lo que se mete en `changes`; un Exception la corta."""
+
+    def __init__(self, changes: asyncio.Queue, error_on_enter: Exception = None):
+        self._changes = changes
+        self._error_on_enter = error_on_enter
+        self.resume_token = None
+
+    async def __aenter__(self):
+        if self._error_on_enter:
+            raise self._error_on_enter
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        change = await self._changes.get()
+        if isinstance(change, Exception):
+            raise change
+        self.resume_token = change["_id"]
+        return change
+
+
+def _matches(document: dict, filter: dict) -> bool:
+    """Subconjunto de consultas de Mongo que usan los repositorios de tareas."""
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(_matches(document, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches(document, sub) for sub in condition):
+                return False
+            continue
+        value = document.get(key)
+        if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            for op, operand in condition.items():
+                if op == "$nin" and value in operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$exists" and (key in document) != operand:
+                    return False
+                if op in ("$lt", "$lte", "$gt", "$gte"):
+                    if value is None:
+                        return False
+                    if op == "$lt" and not value < operand:
+                        return False
+                    if op == "$lte" and not value <= operand:
+                        return False
+                    if op == "$gt" and not value > operand:
+                        return False
+                    if op == "$gte" and not value >= operand:
+                        return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeTaskCollection:
+    """
+    Stand-in local de la colección de tareas: watch() para TaskNotifier y las
+    lecturas y escrituras de un documento que usa TaskRepository.
+    """
+
+    def __init__(self, watch_errors=()):
+        self.changes: asyncio.Queue = asyncio.Queue()
+        self.documents = []
+        self.watch_calls = []
+        self._watch_errors = list(watch_errors)
+
+    def watch(self, pipeline, resume_after=None):
+        self.watch_calls.append(resume_after)
+        error = self._watch_errors.pop(0) if self._watch_errors else None
+        return FakeChangeStream(self.changes, error)
+
+    def _find(self, filter, sort=None):
+        found = [doc for doc in self.documents if _matches(doc, filter)]
+        for key, direction in reversed(sort or []):
+            found.sort(key=lambda doc: doc.get(key), reverse=direction < 0)
+        return found
+
+    @staticmethod
+    def _apply(document: dict, update: dict):
+        for key, value in update.get("$set", {}).items():
+            document[key] = value
+        for key, value in update.get("$inc", {}).items():
+            document[key] = document.get(key, 0) + value
+
+    async def find_one(self, filter, projection=None, sort=None):
+        found = self._find(filter, sort)
+        return copy.deepcopy(found[0]) if found else None
+
+    async def find_one_and_update(
+        self, filter, update, sort=None, return_document=ReturnDocument.BEFORE, **kwargs
+    ):
+        found = self._find(filter, sort)
+        if not found:
+            return None
+        before = copy.deepcopy(found[0])
+        self._apply(found[0], update)
+        return copy.deepcopy(found[0]) if return_document == ReturnDocument.AFTER else before
+
+    async def update_one(self, filter, update):
+        found = self._find(filter)
+        if found:
+            self._apply(found[0], update)
+        return SimpleNamespace(matched_count=len(found[:1]), modified_count=len(found[:1]))
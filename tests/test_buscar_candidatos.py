@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from common.config import LIMIT_VIEWS
+from common.utils import search_and_insert
+from common.utils.search_and_insert import buscar_candidatos, crear_candidato
+
+
+class FakeRateLimiter:
+    """Limitador sin límite: cuenta los tokens pedidos."""
+
+    def __init__(self):
+        self.consumidos = 0
+
+    async def consumir(self, provider, timeout=None):
+        self.consumidos += 1
+
+
+class FakeSearchPool:
+    timeout = 5
+
+
+class FakeVideoService:
+    def __init__(self, existentes):
+        self.existentes = set(existentes)
+
+    async def get_existing_ids(self, video_ids):
+        return {video_id for video_id in video_ids if video_id in self.existentes}
+
+
+def paginas_fijas(paginas):
+    """Estrategia asíncrona que entrega `paginas` y anota cuántas se pidieron."""
+    pedidas = []
+
+    async def estrategia(busqueda, cantidad, recientes=False, presupuesto=None):
+        for pagina in paginas:
+            await presupuesto()
+            pedidas.append(pagina)
+            yield pagina
+
+    return estrategia, pedidas
+
+
+class BuscarCandidatosTest(unittest.IsolatedAsyncioTestCase):
+
+    async def recoger(self, paginas, existentes):
+        estrategia, pedidas = paginas_fijas(paginas)
+        with mock.patch.object(search_and_insert, "ESTRATEGIAS", (("fake", estrategia),)), \
+                mock.patch.object(search_and_insert, "get_rate_limiter", FakeRateLimiter), \
+                mock.patch.object(search_and_insert, "get_search_pool", FakeSearchPool):
+            entregados = [
+                [c["video_id"] for c in pagina]
+                async for _, pagina in buscar_candidatos(
+                    "gatos", videoService=FakeVideoService(existentes)
+                )
+            ]
+        return entregados, pedidas
+
+    async def test_stops_when_every_publishable_candidate_is_known(self):
+        paginas = [
+            [crear_candidato("nuevo", views=10), crear_candidato("viral-1", views=LIMIT_VIEWS + 1)],
+            # Conocidos mezclados con candidatos que superan el límite
+            [
+                crear_candidato("conocido-1", views=10),
+                crear_candidato("viral-2", views=LIMIT_VIEWS * 10),
+                crear_candidato("conocido-2"),
+                crear_candidato("viral-3", views=LIMIT_VIEWS + 1),
+            ],
+            [crear_candidato("antiguo", views=10)],
+        ]
+
+        entregados, pedidas = await self.recoger(paginas, {"conocido-1", "conocido-2"})
+
+        self.assertEqual(entregados, [["nuevo", "viral-1"]])
+        self.assertEqual(len(pedidas), 2)
+
+    async def test_keeps_paging_past_pages_without_publishable_candidates(self):
+        paginas = [
+            [crear_candidato("viral-1", views=LIMIT_VIEWS + 1)],
+            [crear_candidato("nuevo", views=10), crear_candidato("conocido")],
+        ]
+
+        entregados, pedidas = await self.recoger(paginas, {"conocido"})
+
+        self.assertEqual(entregados, [["viral-1"], ["nuevo"]])
+        self.assertEqual(len(pedidas), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
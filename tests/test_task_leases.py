@@ -0,0 +1,102 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from common.config import TASK_MAX_ATTEMPTS, TASK_RETRY_BASE_SECONDS
+from repository import TaskRepository as task_repository_module
+from repository.TaskRepository import TaskRepository
+from service.TaskService import TaskService
+from tests.fakes import FakeTaskCollection
+
+
+def pending_task(task_id: str, **fields) -> dict:
+    return {
+        "_id": task_id,
+        "name": task_id,
+        "date": "2024-01-01T00:00:00",
+        "completed_at": None,
+        "priority": 0,
+        "recurring_interval": None,
+        "next_run_at": None,
+        "lease_until": None,
+        "claimed_by": None,
+        "status": "pending",
+        "attempts": 0,
+        **fields,
+    }
+
+
+class TaskLeaseTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.collection = FakeTaskCollection()
+        patcher = mock.patch.object(
+            task_repository_module, "db_tasks", SimpleNamespace(tasks=self.collection)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.repository = TaskRepository()
+        self.service = TaskService(self.repository)
+
+    def stored(self, task_id: str) -> dict:
+        return next(doc for doc in self.collection.documents if doc["_id"] == task_id)
+
+    async def test_claim_skips_live_leases_and_takes_over_expired_ones(self):
+        self.collection.documents.append(pending_task("task-1"))
+
+        first = await self.repository.claim_next_task("worker-a", 60)
+        self.assertEqual(first.claimed_by, "worker-a")
+        self.assertIsNone(await self.repository.claim_next_task("worker-b", 60))
+
+        # worker-a deja de renovar y su lease vence
+        self.stored("task-1")["lease_until"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        second = await self.repository.claim_next_task("worker-b", 60)
+
+        self.assertEqual(second.claimed_by, "worker-b")
+        self.assertEqual(second.attempts, 2)
+        self.assertFalse(await self.repository.renew_lease("task-1", "worker-a", 60))
+        self.assertTrue(await self.repository.renew_lease("task-1", "worker-b", 60))
+
+    async def test_stale_worker_cannot_complete_fail_or_report_progress(self):
+        self.collection.documents.append(pending_task("task-1"))
+        stale = await self.repository.claim_next_task("worker-a", 60)
+        self.stored("task-1")["lease_until"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        current = await self.repository.claim_next_task("worker-b", 60)
+
+        self.assertFalse(await self.service.finish_task(stale))
+        self.assertEqual(await self.service.fail_task(stale, "boom"), "lease_lost")
+        self.assertFalse(
+            await self.service.update_progress("task-1", {"found": 3}, {}, stale.claimed_by)
+        )
+        self.assertEqual(self.stored("task-1")["status"], "running")
+
+        self.assertTrue(await self.service.finish_task(current))
+        self.assertEqual(self.stored("task-1")["status"], "done")
+
+    async def test_failures_back_off_until_the_last_attempt_goes_dead(self):
+        self.collection.documents.append(pending_task("task-1"))
+
+        for attempt in range(1, TASK_MAX_ATTEMPTS):
+            task = await self.repository.claim_next_task("worker-a", 60)
+            self.assertEqual(task.attempts, attempt)
+            before = datetime.now(timezone.utc)
+            self.assertEqual(await self.service.fail_task(task, "boom"), "failed")
+
+            stored = self.stored("task-1")
+            delay = TASK_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+            self.assertGreaterEqual(stored["next_run_at"], before + timedelta(seconds=delay))
+            self.assertIsNone(stored["claimed_by"])
+            # El reintento no se reclama antes de tiempo
+            self.assertIsNone(await self.repository.claim_next_task("worker-a", 60))
+            stored["next_run_at"] = before
+
+        task = await self.repository.claim_next_task("worker-a", 60)
+        self.assertEqual(task.attempts, TASK_MAX_ATTEMPTS)
+        self.assertEqual(await self.service.fail_task(task, "boom"), "dead")
+        self.assertEqual(self.stored("task-1")["status"], "dead")
+        self.assertIsNone(await self.repository.claim_next_task("worker-a", 60))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from repository.TaskNotifier import TaskNotifier
+from tests.fakes import FakeTaskCollection
+
+
+class TaskNotifierTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncTearDown(self):
+        await self.notifier.stop()
+
+    async def test_change_stream_insert_wakes_waiters(self):
+        collection = FakeTaskCollection()
+        self.notifier = TaskNotifier(collection, 0.01, 0.05)
+        await self.notifier.start()
+
+        self.assertFalse(await self.notifier.wait(0.05))
+        collection.changes.put_nowait({"_id": "token-1", "operationType": "insert"})
+
+        self.assertTrue(await self.notifier.wait(1))
+        self.assertEqual(self.notifier.mode, "change_stream")
+
+    async def test_falls_back_to_polling_when_change_streams_are_unsupported(self):
+        collection = FakeTaskCollection(
+            watch_errors=[OperationFailure("not a replica set", code=40573)]
+        )
+        collection.documents.append({"_id": "task-1", "date": "2024-01-01T00:00:00"})
+        self.notifier = TaskNotifier(collection, 0.01, 0.05)
+        await self.notifier.start()
+
+        self.assertFalse(await self.notifier.wait(0.05))
+        self.assertEqual(self.notifier.mode, "polling")
+
+        collection.documents.append({"_id": "task-2", "date": "2024-01-02T00:00:00"})
+        self.assertTrue(await self.notifier.wait(1))
+
+    async def test_other_operation_failures_do_not_fall_back(self):
+        collection = FakeTaskCollection(
+            watch_errors=[OperationFailure("interrupted", code=11601)]
+        )
+        self.notifier = TaskNotifier(collection, 0.01, 0.05)
+        await self.notifier.start()
+
+        # La reconexión también despierta a los workers por si se perdió un insert
+        self.assertTrue(await self.notifier.wait(1))
+        self.assertEqual(self.notifier.mode, "change_stream")
+
+    async def test_reconnects_with_exponential_backoff_and_resume_token(self):
+        collection = FakeTaskCollection(
+            watch_errors=[PyMongoError("connection reset")] * 4
+        )
+        self.notifier = TaskNotifier(collection, 0.01, 0.05)
+        sleeps = []
+        real_sleep = asyncio.sleep
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            await real_sleep(0)
+
+        with mock.patch("repository.TaskNotifier.asyncio.sleep", fake_sleep):
+            await self.notifier.start()
+            while len(collection.watch_calls) < 5:
+                await real_sleep(0)
+            # Conecta: un cambio y después se corta el stream
+            collection.changes.put_nowait({"_id": "token-1", "operationType": "insert"})
+            collection.changes.put_nowait(PyMongoError("stepdown"))
+            while len(collection.watch_calls) < 6:
+                await real_sleep(0)
+
+        self.assertEqual(sleeps[:4], [0.01, 0.02, 0.04, 0.05])
+        # Tras conectar bien el backoff vuelve al mínimo
+        self.assertEqual(sleeps[4], 0.01)
+        self.assertEqual(collection.watch_calls[:5], [None] * 5)
+        self.assertEqual(collection.watch_calls[5], "token-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+
+from repository.VideoInsertBuffer import VideoInsertBuffer
+
+
+class FakeVideoCollection:
+    """Stand-in local de la colección de videos: solo registra los insert_many."""
+
+    def __init__(self, gate: asyncio.Event = None):
+        self.batches = []
+        self._gate = gate
+
+    async def insert_many(self, documents, ordered=True):
+        self.batches.append([doc["_id"] for doc in documents])
+        if self._gate is not None:
+            await self._gate.wait()
+
+
+async def settle():
+    """Deja correr las tareas ya planificadas (vaciados y escrituras)."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class VideoInsertBufferTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_flushes_when_every_publisher_is_waiting(self):
+        collection = FakeVideoCollection()
+        buffer = VideoInsertBuffer(collection, 100, 60)
+        for _ in range(3):
+            buffer.registrar()
+
+        inserts = [asyncio.create_task(buffer.insert({"_id": i})) for i in range(2)]
+        await asyncio.sleep(0)
+        self.assertEqual(collection.batches, [])
+
+        # El tercer publicador se queda sin candidatos: el lote ya no crece
+        with buffer.sin_trabajo():
+            self.assertEqual(await asyncio.wait_for(asyncio.gather(*inserts), 1), [True, True])
+        self.assertEqual(collection.batches, [[0, 1]])
+
+    async def test_publishers_waiting_on_an_inflight_write_count_as_waiting(self):
+        gate = asyncio.Event()
+        collection = FakeVideoCollection(gate)
+        buffer = VideoInsertBuffer(collection, 100, 60)
+        for _ in range(3):
+            buffer.registrar()
+
+        with buffer.sin_trabajo():
+            first = [asyncio.create_task(buffer.insert({"_id": i})) for i in range(2)]
+            await settle()
+        self.assertEqual(collection.batches, [[0, 1]])
+
+        # Los dos primeros siguen esperando su escritura: el tercero no espera al temporizador
+        last = asyncio.create_task(buffer.insert({"_id": 2}))
+        await settle()
+        self.assertEqual(collection.batches, [[0, 1], [2]])
+
+        gate.set()
+        self.assertEqual(await asyncio.wait_for(asyncio.gather(*first, last), 1), [True, True, True])
+
+    async def test_flushes_when_a_publisher_leaves(self):
+        collection = FakeVideoCollection()
+        buffer = VideoInsertBuffer(collection, 100, 60)
+        buffer.registrar()
+        buffer.registrar()
+
+        insert = asyncio.create_task(buffer.insert({"_id": "a"}))
+        await asyncio.sleep(0)
+        buffer.liberar()
+
+        self.assertTrue(await asyncio.wait_for(insert, 1))
+        self.assertEqual(collection.batches, [["a"]])
+
+    async def test_without_publishers_waits_for_the_timer(self):
+        collection = FakeVideoCollection()
+        buffer = VideoInsertBuffer(collection, 100, 0.05)
+
+        self.assertTrue(await asyncio.wait_for(buffer.insert({"_id": "a"}), 1))
+        self.assertEqual(collection.batches, [["a"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+Worker de ingesta independiente de la API.
+
+Procesa la cola de tareas de búsqueda (búsqueda, scraping e inserción) contra
+la misma base de datos que la API, de modo que ambos se puedan escalar por
+separado. Para que la API no procese tareas: EMBEDDED_TASK_PROCESSOR=false.
+
+Uso:
+    python worker.py [--workers N]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+from typing import Dict, List, Optional
+
+from common.config import TASK_WORKERS, TASK_LEASE_SECONDS, TASK_POLL_INTERVAL
+from common.config import TASK_PROGRESS_INTERVAL, LOOP_MONITOR_ENABLED
+from service.TaskService import ITaskService
+from repository.TaskNotifier import ITaskNotifier
+
+
+async def renew_task_lease(
+    taskService: ITaskService, task_id: str, worker_id: str, processing: asyncio.Task
+):
+    while True:
+        await asyncio.sleep(TASK_LEASE_SECONDS / 3)
+        if not await taskService.renew_lease(task_id, worker_id, TASK_LEASE_SECONDS):
+            # Otro worker puede haberla reclamado: se deja de trabajar en ella
+            print(f"[{worker_id}] Lease lost for task {task_id}, stopping it")
+            processing.cancel()
+            return
+
+
+class TaskProgress:
+    """
+    Acumula los contadores y tiempos de la tarea en curso y los vuelca a Mongo
+    como mucho cada TASK_PROGRESS_INTERVAL segundos, para no hacer una
+    escritura por video.
+    """
+
+    def __init__(self, taskService: ITaskService, task_id: str, worker_id: Optional[str] = None):
+        self._taskService = taskService
+        self._task_id = task_id
+        self._worker_id = worker_id
+        self._counters: Dict[str, int] = {}
+        self._timings: Dict[str, float] = {}
+        self.totals: Dict[str, int] = {}
+
+    def add(self, counter: str, amount: int = 1):
+        if amount:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+            self.totals[counter] = self.totals.get(counter, 0) + amount
+
+    def timing(self, stage: str, seconds: float):
+        self._timings[stage] = round(seconds, 3)
+
+    async def flush(self):
+        counters, self._counters = self._counters, {}
+        timings, self._timings = self._timings, {}
+        if counters or timings:
+            await self._taskService.update_progress(self._task_id, counters, timings, self._worker_id)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(TASK_PROGRESS_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error saving progress for task {self._task_id}: {e}")
+
+
+async def process_tasks_loop(
+    taskService: ITaskService, task_notifier: ITaskNotifier, videoService, worker_id: str
+):
+    from common.utils.search_and_insert import buscar_y_procesar
+
+    print(f"Starting task processor {worker_id}...")
+    while True:
+        while True:
+            task = await taskService.claim_next_task(worker_id, TASK_LEASE_SECONDS)
+            if not task:
+                break
+
+            print(f"[{worker_id}] Processing task: {task.name} (attempt {task.attempts})")
+            progress = TaskProgress(taskService, task.id, worker_id)
+            progress_task = asyncio.create_task(progress.run())
+            processing = asyncio.create_task(
+                buscar_y_procesar(
+                    task.name,
+                    videoService,
+                    incremental=bool(task.recurring_interval),
+                    progreso=progress,
+                )
+            )
+            lease_task = asyncio.create_task(
+                renew_task_lease(taskService, task.id, worker_id, processing)
+            )
+            try:
+                await processing
+            except asyncio.CancelledError:
+                if lease_task.done() and not asyncio.current_task().cancelling():
+                    # Cancelada por perder el lease: ya no es nuestra, ni se libera ni se marca
+                    continue
+                await taskService.release_task(task.id, worker_id)
+                raise
+            except Exception as e:
+                await progress.flush()
+                status = await taskService.fail_task(task, str(e))
+                print(f"[{worker_id}] Error processing task {task.name} ({status}): {e}")
+                continue
+            finally:
+                lease_task.cancel()
+                progress_task.cancel()
+
+            await progress.flush()
+            if not await taskService.finish_task(task):
+                print(f"[{worker_id}] Lease lost before completing task {task.name}")
+                continue
+            print(f"[{worker_id}] Task completed: {task.name} {progress.totals}")
+
+        print(f"[{worker_id}] No more pending tasks. Waiting for new tasks...")
+        # El timeout hace que se reclamen también las tareas cuyo lease ha
+        # vencido (worker caído) aunque nadie haya insertado tareas nuevas
+        await task_notifier.wait(min(TASK_POLL_INTERVAL, TASK_LEASE_SECONDS))
+
+
+def start_task_workers(
+    taskService: ITaskService, task_notifier: ITaskNotifier, videoService, workers: int
+) -> List[asyncio.Task]:
+    worker_prefix = f"{socket.gethostname()}-{os.getpid()}"
+    return [
+        asyncio.create_task(
+            process_tasks_loop(
+                taskService, task_notifier, videoService, f"{worker_prefix}-{n}"
+            )
+        )
+        for n in range(workers)
+    ]
+
+
+async def main(workers: int):
+    from common.ioc import (
+        get_task_repository,
+        get_task_service,
+        get_task_notifier,
+        get_video_service,
+        get_search_pool,
+        get_invidious_client,
+        get_video_insert_buffer,
+        get_loop_monitor,
+    )
+
+    # Los bloqueos del loop en el worker solo se ven en el log
+    if LOOP_MONITOR_ENABLED:
+        get_loop_monitor().start()
+    await get_task_repository().ensure_indexes()
+    task_notifier = get_task_notifier()
+    await task_notifier.start()
+    tasks = start_task_workers(
+        get_task_service(), task_notifier, get_video_service(), workers
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: [t.cancel() for t in tasks])
+
+    try:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await task_notifier.stop()
+        await get_loop_monitor().stop()
+        await get_video_insert_buffer().flush()
+        get_search_pool().cerrar()
+        await get_invidious_client().cerrar()
+        print("Worker stopped.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RandomYT ingest worker")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=TASK_WORKERS,
+        help="Número de tareas procesadas en paralelo (default: TASK_WORKERS)",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.workers))